@@ -1,3 +1,6 @@
 from __future__ import absolute_import
 
+from .hedging import HedgingPolicy
 from .models import Client
+from .pool import ClientPool
+from .tracing import InMemoryCollector, JsonLinesExporter, Tracer
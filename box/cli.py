@@ -0,0 +1,746 @@
+"""
+Command line tool for bulk Box transfers
+
+    box ls -R /Projects
+    box ls -R --json /Projects > listing.ndjson
+    box cp -r -j 16 ./photos box:/Backups
+    box cp -r box:/Backups/photos ./restore
+    box sync --delete ./photos box:/Backups/photos
+    box rm -r /Backups/old
+
+Remote paths are prefixed with `box:` where a command takes both local and
+remote paths.  Files whose SHA-1 already matches the destination are
+skipped and partial downloads are resumed, so an interrupted run can simply
+be started again.  The access token is read from --token or the
+BOX_ACCESS_TOKEN environment variable.
+"""
+from __future__ import absolute_import, print_function
+
+import argparse
+import codecs
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+from multiprocessing.pool import ThreadPool
+
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import HTTPError
+
+from .models import CONFLICT_SKIP, DEFAULT_WORKERS, ROOT_FOLDER, Client, _imap_unordered
+from .tracing import Tracer
+
+REMOTE_PREFIX = 'box:'
+
+LISTING_FIELDS = 'name,size,sha1,etag,modified_at'
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# suffix of partially downloaded files
+PART_SUFFIX = '.part'
+
+
+class CommandError(Exception):
+    pass
+
+
+def _raise_for_status(response, *args, **kwargs):
+    response.raise_for_status()
+
+
+def _session(token, jobs):
+    """
+    Returns a requests session authorized with the given token, for use as an oauth2_client
+    """
+    session = requests.Session()
+    session.headers['Authorization'] = 'Bearer {}'.format(token)
+    session.hooks['response'].append(_raise_for_status)
+
+    # keep a connection open per job
+    adapter = HTTPAdapter(pool_maxsize=jobs)
+    session.mount('https://', adapter)
+
+    return session
+
+
+def _sha1(path):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as fileobj:
+        for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b''):
+            sha1.update(chunk)
+
+    return sha1.hexdigest()
+
+
+def _decode(path):
+    """
+    Returns the given local path or name as unicode, for comparison with Box names
+
+    On Python 2 command line arguments and os.listdir() names are byte strings
+    in the file system encoding.
+    """
+    if isinstance(path, bytes):
+        return path.decode(sys.getfilesystemencoding() or 'utf-8')
+
+    return path
+
+
+def _encode(name):
+    """
+    Returns the given Box name as a local path component, see _decode()
+    """
+    if str is bytes and not isinstance(name, bytes):
+        return name.encode(sys.getfilesystemencoding() or 'utf-8')
+
+    return name
+
+
+def _text_stream(stream):
+    """
+    Returns the given standard stream, writing unicode as UTF-8 when Python 2 does not know its encoding, e.g. a pipe
+    """
+    if str is bytes and getattr(stream, 'encoding', None) is None:
+        return codecs.getwriter('utf-8')(stream)
+
+    return stream
+
+
+def _is_remote(path):
+    return path.startswith(REMOTE_PREFIX)
+
+
+def _remote_path(path):
+    path = _decode(path)
+    path = path[len(REMOTE_PREFIX):] if _is_remote(path) else path
+    return u'/' + path.strip(u'/')
+
+
+def _join(path, name):
+    return u'{}/{}'.format(path.rstrip(u'/'), name)
+
+
+def _percentile(values, percentile):
+    return values[int(round(percentile / 100.0 * (len(values) - 1)))]
+
+
+class _Summary(object):
+    """
+    Span exporter that aggregates request latencies for the end of run summary
+    """
+    def __init__(self):
+        self.start = time.time()
+
+        self.latencies = []
+        self.request_errors = 0
+
+        self.done = 0
+        self.skipped = 0
+        self.errors = 0
+        self.bytes = 0
+
+        self.lock = threading.Lock()
+
+    def add(self, event):
+        if 'error' in event:
+            self.errors += 1
+        elif event.get('skipped'):
+            self.skipped += 1
+        else:
+            self.done += 1
+            self.bytes += event.get('bytes', 0)
+
+    def export(self, span):
+        if not span.name.startswith('http.'):
+            return
+
+        with self.lock:
+            self.latencies.append(span.duration)
+
+            if 'error' in span.attributes:
+                self.request_errors += 1
+
+    def report(self, out):
+        elapsed = max(time.time() - self.start, 1e-6)
+
+        print('{} done, {} skipped, {} failed; {} bytes in {:.1f}s ({:.2f} MB/s, {:.1f} items/s)'.format(
+            self.done, self.skipped, self.errors, self.bytes, elapsed,
+            self.bytes / elapsed / 1e6, self.done / elapsed,
+        ), file=out)
+
+        with self.lock:
+            latencies = sorted(self.latencies)
+
+        if latencies:
+            print('{} requests, {} failed; latency p50 {:.0f}ms, p95 {:.0f}ms, p99 {:.0f}ms, max {:.0f}ms'.format(
+                len(latencies), self.request_errors,
+                _percentile(latencies, 50) * 1000, _percentile(latencies, 95) * 1000,
+                _percentile(latencies, 99) * 1000, latencies[-1] * 1000,
+            ), file=out)
+
+
+class _Remote(object):
+    """
+    Resolves remote paths, caching folder listings
+    """
+    def __init__(self, client):
+        self.client = client
+
+        self.root = dict(ROOT_FOLDER, type='folder', name='')
+        self.listings = {}
+        self.lock = threading.Lock()
+
+    def child(self, folder, name):
+        for item in self.listing(folder):
+            if item['name'] == name:
+                return item
+
+        return None
+
+    def ensure_folder(self, parent, name):
+        """
+        Returns the named folder in parent, creating it when it does not exist
+        """
+        existing = self.child(parent, name)
+        if existing is not None:
+            if existing['type'] != 'folder':
+                raise CommandError(u'{}: not a folder'.format(name))
+
+            return existing
+
+        try:
+            folder = self.client.create_folder(name, parent)
+        except HTTPError as exc:
+            if exc.response.status_code != 409:
+                raise
+
+            # created in the meantime
+            conflicts = exc.response.json()['context_info']['conflicts']
+            folder = conflicts[0] if isinstance(conflicts, list) else conflicts
+
+        folder = dict(folder, type='folder', name=name)
+
+        with self.lock:
+            self.listings[str(parent['id'])].append(folder)
+            self.listings.setdefault(str(folder['id']), [])
+
+        return folder
+
+    def listing(self, folder, cache=True):
+        """
+        Returns the folder's items
+
+        When cache is False and the listing is not cached already, the items are
+        returned as a generator, so that a large folder is processed as each
+        page arrives rather than once it is listed in full.
+        """
+        key = str(folder['id'])
+
+        with self.lock:
+            items = self.listings.get(key)
+
+        if items is not None:
+            return items
+
+        items = self.client.folder_items(folder, limit=sys.maxsize, fields=LISTING_FIELDS)
+        if not cache:
+            return items
+
+        items = list(items)
+
+        with self.lock:
+            return self.listings.setdefault(key, items)
+
+    def resolve(self, path, create=False):
+        """
+        Returns the item at the given path, optionally creating missing folders
+        """
+        path = _decode(path)
+
+        item = self.root
+        for name in _remote_path(path).split('/'):
+            if not name:
+                continue
+
+            if item['type'] != 'folder':
+                raise CommandError(u'{}: not a folder'.format(path))
+
+            if create:
+                item = self.ensure_folder(item, name)
+            else:
+                item = self.child(item, name)
+                if item is None:
+                    raise CommandError(u'{}: not found'.format(path))
+
+        return item
+
+    def walk(self, folder, path, jobs):
+        """
+        Generator for (path, item) tuples of everything in folder
+
+        Up to `jobs` folders are listed concurrently and their items are
+        yielded as each page arrives; a folder is yielded before its items.
+        """
+        entries = queue.Queue()
+
+        def list_folder(_path, _folder):
+            try:
+                for item in self.listing(_folder, cache=False):
+                    entries.put((_path, item, None))
+            except Exception as exc:
+                entries.put((_path, None, exc))
+            finally:
+                # the folder is done
+                entries.put(None)
+
+        pool = ThreadPool(jobs)
+        try:
+            pool.apply_async(list_folder, (path, folder))
+            listing = 1
+
+            while listing:
+                entry = entries.get()
+                if entry is None:
+                    listing -= 1
+                    continue
+
+                _path, item, error = entry
+                if error is not None:
+                    raise error
+
+                item_path = _join(_path, item['name'])
+                if item['type'] == 'folder':
+                    pool.apply_async(list_folder, (item_path, item))
+                    listing += 1
+
+                yield item_path, item
+        finally:
+            pool.terminate()
+
+
+class Command(object):
+    """
+    Runs a command line command
+
+    Transfers are run as tasks on a pool of `jobs` threads; each task returns
+    an event dictionary that is printed as it completes.
+    """
+    def __init__(self, client, args, summary, out, err):
+        self.client = client
+        self.args = args
+        self.summary = summary
+        self.out = out
+        self.err = err
+
+        self.remote = _Remote(client)
+
+    def cp(self):
+        if len(self.args.paths) < 2:
+            raise CommandError('cp requires a source and a destination')
+
+        sources, dest = self.args.paths[:-1], self.args.paths[-1]
+
+        if _is_remote(dest):
+            folder = self.remote.resolve(dest, create=True)
+            if all(_is_remote(source) for source in sources):
+                tasks = self._copy_sources(sources, folder, _remote_path(dest))
+            elif not any(_is_remote(source) for source in sources):
+                tasks = self._upload_sources(sources, folder, _remote_path(dest))
+            else:
+                raise CommandError('sources must be all local or all remote')
+        elif all(_is_remote(source) for source in sources):
+            tasks = self._download_sources(sources, dest)
+        else:
+            raise CommandError('the source or the destination must be remote')
+
+        return self._run(tasks)
+
+    def ls(self):
+        for path in self.args.paths or ['/']:
+            item = self.remote.resolve(path)
+            path = _remote_path(path)
+
+            if item['type'] != 'folder':
+                items = [(path, item)]
+            elif self.args.recursive:
+                items = self.remote.walk(item, path, self.args.jobs)
+            else:
+                items = ((_join(path, child['name']), child) for child in self.remote.listing(item, cache=False))
+
+            for item_path, child in items:
+                self.summary.add({})
+                self._print_item(item_path, child)
+
+        return 0
+
+    def rm(self):
+        items = []
+        for path in self.args.paths:
+            item = self.remote.resolve(path)
+
+            if item is self.remote.root:
+                raise CommandError('refusing to remove the root folder')
+
+            if item['type'] == 'folder' and not self.args.recursive:
+                raise CommandError(u'{}: is a folder (use -r)'.format(_decode(path)))
+
+            items.append((self._delete_remote, REMOTE_PREFIX + _remote_path(path), (item,)))
+
+        return self._run(items)
+
+    def sync(self):
+        source, dest = self.args.source, self.args.dest
+
+        if _is_remote(dest) and not _is_remote(source):
+            if not os.path.isdir(source):
+                raise CommandError(u'{}: not a directory'.format(_decode(source)))
+
+            folder = self.remote.resolve(dest, create=True)
+            tasks = self._upload_tree(source, folder, _remote_path(dest), self.args.delete)
+        elif _is_remote(source) and not _is_remote(dest):
+            folder = self.remote.resolve(source)
+            if folder['type'] != 'folder':
+                raise CommandError(u'{}: not a folder'.format(_decode(source)))
+
+            tasks = self._download_tree(folder, dest, _remote_path(source), self.args.delete)
+        else:
+            raise CommandError('exactly one of the source and the destination must be remote')
+
+        return self._run(tasks)
+
+    def _copy_sources(self, sources, folder, path):
+        items = [(source, self.remote.resolve(source)) for source in sources]
+
+        for source, item in items:
+            if item['type'] == 'folder' and not self.args.recursive:
+                raise CommandError(u'{}: is a folder (use -r)'.format(_decode(source)))
+
+        def tasks():
+            for source, item in items:
+                yield self._copy_remote, REMOTE_PREFIX + _join(path, item['name']), (item, folder)
+
+        return tasks()
+
+    def _download_sources(self, sources, dest):
+        items = [(source, self.remote.resolve(source)) for source in sources]
+
+        for source, item in items:
+            if item['type'] == 'folder' and not self.args.recursive:
+                raise CommandError(u'{}: is a folder (use -r)'.format(_decode(source)))
+
+        if len(items) > 1 and not os.path.isdir(dest):
+            raise CommandError(u'{}: not a directory'.format(_decode(dest)))
+
+        def tasks():
+            for source, item in items:
+                target = os.path.join(dest, _encode(item['name'])) if os.path.isdir(dest) else dest
+
+                if item['type'] == 'folder':
+                    for task in self._download_tree(item, target, _remote_path(source), False):
+                        yield task
+                else:
+                    yield self._download, target, (item, target)
+
+        return tasks()
+
+    def _download_tree(self, folder, local_dir, path, delete):
+        if not os.path.isdir(local_dir):
+            os.makedirs(local_dir)
+
+        names = set()
+        for item in self.remote.listing(folder, cache=False):
+            names.add(item['name'])
+            target = os.path.join(local_dir, _encode(item['name']))
+
+            if item['type'] == 'folder':
+                for task in self._download_tree(item, target, _join(path, item['name']), delete):
+                    yield task
+            elif item['type'] == 'file':
+                yield self._download, target, (item, target)
+
+        if delete:
+            for name in sorted(os.listdir(local_dir)):
+                if _decode(name) not in names and not name.endswith(PART_SUFFIX):
+                    target = os.path.join(local_dir, name)
+                    yield self._delete_local, target, (target,)
+
+    def _upload_sources(self, sources, folder, path):
+        for source in sources:
+            if not os.path.exists(source):
+                raise CommandError(u'{}: not found'.format(_decode(source)))
+
+            if os.path.isdir(source) and not self.args.recursive:
+                raise CommandError(u'{}: is a directory (use -r)'.format(_decode(source)))
+
+        def tasks():
+            for source in sources:
+                name = _decode(os.path.basename(os.path.normpath(source)))
+                target = _join(path, name)
+
+                if os.path.isdir(source):
+                    subfolder = self.remote.ensure_folder(folder, name)
+                    for task in self._upload_tree(source, subfolder, target, False):
+                        yield task
+                else:
+                    yield self._upload, REMOTE_PREFIX + target, (source, folder, name)
+
+        return tasks()
+
+    def _upload_tree(self, local_dir, folder, path, delete):
+        names = set()
+        for local_name in sorted(os.listdir(local_dir)):
+            source = os.path.join(local_dir, local_name)
+
+            name = _decode(local_name)
+            names.add(name)
+            target = _join(path, name)
+
+            if os.path.isdir(source):
+                subfolder = self.remote.ensure_folder(folder, name)
+                for task in self._upload_tree(source, subfolder, target, delete):
+                    yield task
+            elif os.path.isfile(source):
+                yield self._upload, REMOTE_PREFIX + target, (source, folder, name)
+
+        if delete:
+            for item in list(self.remote.listing(folder)):
+                if item['name'] not in names:
+                    yield self._delete_remote, REMOTE_PREFIX + _join(path, item['name']), (item,)
+
+    def _copy_remote(self, item, folder):
+        copied = self.client.copy(item, folder, conflict=CONFLICT_SKIP)
+
+        return {'skipped': copied is None}
+
+    def _delete_local(self, path):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+        return {}
+
+    def _delete_remote(self, item):
+        if item['type'] == 'folder':
+            self.client.delete_folder(item, recursive=True)
+        else:
+            self.client.delete(item)
+
+        return {}
+
+    def _download(self, item, path):
+        """
+        Downloads the file to path, resuming a partial download and skipping it when path is up to date
+        """
+        size = item.get('size') or 0
+        sha1 = item.get('sha1')
+
+        if sha1 and os.path.isfile(path) and os.path.getsize(path) == size and _sha1(path) == sha1:
+            return {'skipped': True}
+
+        part = path + PART_SUFFIX
+
+        offset = os.path.getsize(part) if os.path.isfile(part) else 0
+        if offset > size:
+            offset = 0
+
+        written = 0
+        if offset == 0 or offset < size:
+            with open(part, 'r+b' if offset else 'wb') as fileobj:
+                fileobj.seek(offset)
+                written = self.client.download(item, fileobj, offset=offset)
+
+        # the download starts over when Box ignores the range
+        offset = os.path.getsize(part) - written
+
+        if sha1 and _sha1(part) != sha1:
+            os.remove(part)
+            raise CommandError(u'{}: checksum mismatch'.format(_decode(path)))
+
+        if os.path.exists(path):
+            os.remove(path)
+
+        os.rename(part, path)
+
+        event = {'bytes': written}
+        if offset:
+            event['resumed_at'] = offset
+
+        return event
+
+    def _upload(self, path, folder, name):
+        """
+        Uploads the file to folder, skipping it when the remote file is up to date
+        """
+        size = os.path.getsize(path)
+        sha1 = _sha1(path)
+
+        existing = self.remote.child(folder, name)
+        if existing is not None:
+            if existing['type'] != 'file':
+                raise CommandError(u'{}: is a folder'.format(name))
+
+            if existing.get('sha1') == sha1:
+                return {'skipped': True}
+
+        with open(path, 'rb') as fileobj:
+            if existing is None:
+                self.client.upload_or_update(folder, fileobj, filename=name, content_hash=sha1)
+            else:
+                self.client.update(existing, fileobj, filename=name, etag=existing.get('etag'), content_hash=sha1)
+
+        return {'bytes': size}
+
+    def _print_event(self, event):
+        if self.args.json:
+            print(json.dumps(event, sort_keys=True), file=self.out)
+            return
+
+        if 'error' in event:
+            status = u'error: {}'.format(event['error'])
+        elif event.get('skipped'):
+            status = 'up to date'
+        elif 'bytes' in event:
+            status = '{} bytes'.format(event['bytes'])
+        else:
+            status = 'done'
+
+        print(u'{:<8} {} ({})'.format(event['op'], event['target'], status), file=self.out)
+
+    def _print_item(self, path, item):
+        if self.args.json:
+            info = {
+                'path': path,
+                'type': item['type'],
+                'id': item['id'],
+            }
+
+            for field in LISTING_FIELDS.split(','):
+                if field in item and field != 'name':
+                    info[field] = item[field]
+
+            print(json.dumps(info, sort_keys=True), file=self.out)
+            return
+
+        print(u'{:<6} {:>14} {:<25} {}'.format(
+            item['type'], item.get('size', ''), item.get('modified_at') or '', path), file=self.out)
+
+    def _run(self, tasks):
+        """
+        Runs the given (func, target, args) tasks concurrently, printing each event as it completes
+
+        :return: exit status
+        """
+        def call(task):
+            func, target, args = task
+
+            event = {
+                'op': func.__name__.lstrip('_'),
+                'target': _decode(target),
+            }
+
+            try:
+                event.update(func(*args))
+            except Exception as exc:
+                event['error'] = u'{}'.format(exc) or repr(exc)
+
+            return event
+
+        def fail(error):
+            raise error
+
+        def safe_tasks():
+            # report errors while finding tasks as a failed task rather than stopping the pool
+            try:
+                for task in tasks:
+                    yield task
+            except Exception as exc:
+                yield fail, '', (exc,)
+
+        for event in _imap_unordered(call, safe_tasks(), self.args.jobs):
+            self.summary.add(event)
+            self._print_event(event)
+
+        return 1 if self.summary.errors else 0
+
+
+def _parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--token', help='Box access token, defaults to $BOX_ACCESS_TOKEN')
+    common.add_argument('-j', '--jobs', type=int, default=DEFAULT_WORKERS, help='number of concurrent requests')
+    common.add_argument('--json', action='store_true', help='print newline delimited JSON')
+    common.add_argument('-q', '--quiet', action='store_true', help='do not print the summary')
+
+    parser = argparse.ArgumentParser(prog='box', description='Bulk Box transfers')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    ls = commands.add_parser('ls', parents=[common], help='list folders')
+    ls.add_argument('-R', '--recursive', action='store_true', help='list everything in the folders')
+    ls.add_argument('paths', nargs='*', help='remote paths, defaults to /')
+
+    cp = commands.add_parser('cp', parents=[common], help='copy files to, from or within Box')
+    cp.add_argument('-r', '--recursive', action='store_true', help='copy directories')
+    cp.add_argument('paths', nargs='+', metavar='path', help='sources followed by the destination')
+
+    rm = commands.add_parser('rm', parents=[common], help='remove files and folders')
+    rm.add_argument('-r', '--recursive', action='store_true', help='remove folders and everything in them')
+    rm.add_argument('paths', nargs='+', help='remote paths')
+
+    sync = commands.add_parser('sync', parents=[common], help='make a directory match another')
+    sync.add_argument('--delete', action='store_true', help='remove files not in the source')
+    sync.add_argument('source')
+    sync.add_argument('dest')
+
+    return parser
+
+
+def main(argv=None, client=None, out=None, err=None):
+    """
+    Runs the command line tool
+
+    :param argv: Optional, the arguments, defaults to sys.argv
+    :param client: Optional, the Client to use; one is created from the access token when None
+    :return: exit status
+    """
+    out = out or _text_stream(sys.stdout)
+    err = err or _text_stream(sys.stderr)
+
+    parser = _parser()
+    args = parser.parse_args(argv)
+
+    summary = _Summary()
+
+    if client is None:
+        token = args.token or os.environ.get('BOX_ACCESS_TOKEN')
+        if not token:
+            parser.error('an access token is required, use --token or set BOX_ACCESS_TOKEN')
+
+        client = Client(_session(token, args.jobs), tracer=Tracer(summary))
+
+    command = Command(client, args, summary, out, err)
+
+    try:
+        status = getattr(command, args.command)()
+    except (CommandError, HTTPError) as exc:
+        print(u'box: {}'.format(exc), file=err)
+        return 1
+
+    if not args.quiet:
+        summary.report(err)
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
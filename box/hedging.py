@@ -0,0 +1,200 @@
+from __future__ import absolute_import
+
+import math
+import threading
+import time
+
+from collections import deque
+
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
+
+
+class HedgingPolicy(object):
+    """
+    Sends a duplicate of a slow request and uses whichever response arrives first
+
+    A request is hedged when it has not completed within the given percentile
+    of recently observed latencies.  Hedges are limited to a fraction of all
+    requests (the budget) so that a slow service is not swamped with
+    duplicates.  The losing request cannot be aborted mid-flight; its response
+    is closed when it arrives.
+
+    The hedging delay adapts to the latency of original requests only, whether
+    they won, lost or failed, so that successful hedges do not lower it.  A
+    request that may be hedged runs on its own thread so that it can be timed
+    out; when the budget is used up, requests are made on the calling thread.
+
+    Only GET requests are hedged, and only those that do not stream their
+    response, i.e. not file downloads.
+
+        client = Client(oauth2_client, hedging=HedgingPolicy())
+    """
+    def __init__(self, percentile=95, budget=0.05, initial_delay=1.0, min_delay=0.01,
+                 min_samples=20, window=1000, clock=time.time):
+        """
+        Hedging policy constructor
+        :param percentile: Hedge requests slower than this percentile of recent latencies
+        :param budget: Maximum fraction of requests that may be hedged
+        :param initial_delay: Seconds before hedging until min_samples latencies have been observed
+        :param min_delay: Never hedge sooner than this many seconds
+        :param min_samples: How many latencies to observe before adapting the delay
+        :param window: How many recent latencies to keep
+        :param clock: Function returning the current time in seconds
+        :return:
+        """
+        self.percentile = percentile
+        self.budget = budget
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.clock = clock
+
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+        self.lock = threading.Lock()
+
+    def delay(self):
+        """
+        Returns how many seconds to wait for a request before hedging it
+        """
+        with self.lock:
+            if len(self.latencies) < max(1, self.min_samples):
+                return self.initial_delay
+
+            latencies = sorted(self.latencies)
+
+        index = int(math.ceil(self.percentile / 100.0 * len(latencies))) - 1
+        return max(self.min_delay, latencies[max(0, index)])
+
+    def stats(self):
+        """
+        Returns the policy's counters
+
+        :return: Dictionary of requests, hedges and how many hedges won
+        """
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+            }
+
+    def call(self, func):
+        """
+        Calls func, hedging it when it is slow
+
+        :param func: callable making an idempotent request
+        :return: func's result
+        """
+        with self.lock:
+            self.requests += 1
+            can_hedge = self.hedges + 1 <= self.budget * self.requests
+
+        if not can_hedge:
+            return self._timed(func)
+
+        results = queue.Queue()
+
+        self._start(lambda: self._timed(func), results, False)
+        outstanding = 1
+
+        try:
+            hedged, response, error = results.get(timeout=self.delay())
+        except queue.Empty:
+            if self._take_hedge():
+                self._start(func, results, True)
+                outstanding += 1
+
+            hedged, response, error = results.get()
+
+        outstanding -= 1
+
+        # an attempt failed; wait for the other one, if any
+        if error is not None and outstanding:
+            hedged, response, error = results.get()
+            outstanding -= 1
+
+        if error is not None:
+            raise error
+
+        if hedged:
+            with self.lock:
+                self.hedge_wins += 1
+
+        if outstanding:
+            self._discard(results)
+
+        return response
+
+    def _discard(self, results):
+        """
+        Closes the losing attempt's response when it arrives
+        """
+        def discard():
+            _hedged, response, _error = results.get()
+            if response is not None and hasattr(response, 'close'):
+                response.close()
+
+        thread = threading.Thread(target=discard)
+        thread.daemon = True
+        thread.start()
+
+    def _start(self, func, results, hedged):
+        def attempt():
+            try:
+                results.put((hedged, func(), None))
+            except Exception as exc:
+                results.put((hedged, None, exc))
+
+        thread = threading.Thread(target=attempt)
+        thread.daemon = True
+        thread.start()
+
+    def _timed(self, func):
+        """
+        Calls func, recording its latency whether it succeeds or fails
+        """
+        start = self.clock()
+        try:
+            return func()
+        finally:
+            latency = self.clock() - start
+
+            with self.lock:
+                self.latencies.append(latency)
+
+    def _take_hedge(self):
+        """
+        Returns whether the budget allows another hedge, counting it when it does
+        """
+        with self.lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                return False
+
+            self.hedges += 1
+
+        return True
+
+
+class _HedgedSession(object):
+    """
+    Stands in for an oauth2_client, hedging its GET requests with the given policy
+    """
+    def __init__(self, oauth2_client, policy):
+        self.oauth2_client = oauth2_client
+        self.policy = policy
+
+    def __getattr__(self, name):
+        return getattr(self.oauth2_client, name)
+
+    def get(self, url, **kwargs):
+        if kwargs.get('stream'):
+            return self.oauth2_client.get(url, **kwargs)
+
+        return self.policy.call(lambda: self.oauth2_client.get(url, **kwargs))
@@ -1,14 +1,44 @@
+import calendar
+import datetime
+import io
+import itertools
 import json
+import re
+import sys
+import tarfile
+import zipfile
+
+from collections import OrderedDict, deque
+from multiprocessing.pool import ThreadPool
 
 from requests.exceptions import HTTPError
 
+from .hedging import _HedgedSession
+from .tracing import _TracedSession, _remaining_bytes, traced
+
 BASE_URL = 'https://api.box.com/2.0'
 
 FILE_URL = '{}/files/{{}}'.format(BASE_URL)
+FILE_CONTENT_URL = '{}/content'.format(FILE_URL)
+FILE_COPY_URL = '{}/copy'.format(FILE_URL)
 
 FOLDERS_URL = '{}/folders'.format(BASE_URL)
 FOLDER_URL = '{}/{{}}'.format(FOLDERS_URL)
 FOLDER_LIST_URL = '{}/items'.format(FOLDER_URL)
+FOLDER_COPY_URL = '{}/copy'.format(FOLDER_URL)
+
+SEARCH_URL = '{}/search'.format(BASE_URL)
+
+FILE_METADATA_URL = '{}/metadata/{{}}/{{}}'.format(FILE_URL)
+
+METADATA_TEMPLATES_URL = '{}/metadata_templates'.format(BASE_URL)
+METADATA_SCOPE_URL = '{}/{{}}'.format(METADATA_TEMPLATES_URL)
+METADATA_TEMPLATE_URL = '{}/{{}}/schema'.format(METADATA_SCOPE_URL)
+CREATE_METADATA_TEMPLATE_URL = '{}/schema'.format(METADATA_TEMPLATES_URL)
+
+METADATA_QUERY_URL = '{}/metadata_queries/execute_read'.format(BASE_URL)
+
+ZIP_DOWNLOADS_URL = '{}/zip_downloads'.format(BASE_URL)
 
 UPLOAD_BASE_URL = 'https://upload.box.com/api/2.0'
 UPLOAD_FILE_URL = '{}/files/content'.format(UPLOAD_BASE_URL)
@@ -17,18 +47,284 @@ UPDATE_FILE_URL = '{}/files/{{}}/content'.format(UPLOAD_BASE_URL)
 
 MAX_FOLDERS = 1000
 
+MAX_SEARCH_RESULTS = 200
+
+MAX_METADATA_RESULTS = 100
+
 ROOT_FOLDER = {'id': 0}
 
+# policies for name conflicts when copying or moving items
+CONFLICT_SKIP = 'skip'
+CONFLICT_RENAME = 'rename'
+CONFLICT_OVERWRITE = 'overwrite'
+CONFLICT_POLICIES = (None, CONFLICT_SKIP, CONFLICT_RENAME, CONFLICT_OVERWRITE)
+
+MAX_RENAMES = 100
+
+# the UTC offset at the end of a Box API timestamp, e.g. 2015-01-02T03:04:05-08:00
+UTC_OFFSET_RE = re.compile(r'([+-])(\d\d):?(\d\d)$')
+
+# default number of concurrent requests made by the bulk methods
+DEFAULT_WORKERS = 8
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# default limit on file contents held in memory while exporting a folder
+MAX_IN_FLIGHT_BYTES = 64 * 1024 * 1024
+
+
+def _imap_unordered(func, iterable, workers):
+    """
+    Generator for the results of calling func on each element of iterable
+
+    The calls are made concurrently on a pool of threads and the results are
+    yielded as they complete.  Closing the generator early stops the pool.
+
+    :param func: callable taking a single argument
+    :param iterable: arguments to call func with
+    :param workers: number of concurrent calls
+    :return: Generator of func results
+    """
+    pool = ThreadPool(workers)
+    try:
+        for result in pool.imap_unordered(func, iterable):
+            yield result
+    finally:
+        pool.terminate()
+
+
+def _prefetch(func, iterable, workers):
+    """
+    Generator for the results of calling func on each element of iterable
+
+    Unlike _imap_unordered() the results are yielded in order; at most
+    `workers` calls are in flight ahead of the consumer.  The first calls are
+    made straight away, not when the first result is requested.  Closing the
+    generator early stops the pool.
+
+    :param func: callable taking a single argument
+    :param iterable: arguments to call func with
+    :param workers: number of concurrent calls
+    :return: Generator of func results
+    """
+    arguments = iter(iterable)
+
+    def results():
+        pool = ThreadPool(workers)
+        pending = deque()
+
+        def submit(count):
+            for args in itertools.islice(arguments, count):
+                pending.append(pool.apply_async(func, (args,)))
+
+        try:
+            submit(workers)
+            yield
+
+            while pending:
+                result = pending.popleft().get()
+                submit(1)
+                yield result
+        finally:
+            pool.terminate()
+
+    generator = results()
+
+    # run up to the first yield so that the calls start before the consumer asks for a result
+    next(generator)
+
+    return generator
+
+
+def _date_range(value):
+    """
+    Formats a (start, end) tuple as a Box API date range
+
+    Either end may be None to leave the range open.  datetime objects are
+    formatted as RFC 3339; naive datetimes are taken to be UTC.
+
+    :param value: (start, end) tuple of datetime objects or strings
+    :return: Box API date range string
+    """
+    formatted = []
+    for date in value:
+        if date is None:
+            date = ''
+        elif hasattr(date, 'isoformat'):
+            tz = '' if date.tzinfo else 'Z'
+            date = date.replace(microsecond=0).isoformat() + tz
+
+        formatted.append(date)
+
+    return ','.join(formatted)
+
+
+def _is_folder(item):
+    return item.get('type') == 'folder'
+
+
+def _check_conflict_policy(conflict):
+    if conflict not in CONFLICT_POLICIES:
+        raise ValueError('unknown conflict policy {!r}'.format(conflict))
+
+
+def _renamed(name, attempt):
+    """
+    Returns the name with a counter added before the extension, e.g. `foo (1).txt`
+    """
+    base, dot, extension = name.rpartition('.')
+    if not base:
+        base, dot, extension = name, '', ''
+
+    return u'{} ({}){}{}'.format(base, attempt, dot, extension)
+
+
+def _parse_timestamp(value):
+    """
+    Returns a datetime for the given Box API timestamp, ignoring its offset
+    """
+    if not value:
+        return datetime.datetime(1980, 1, 1)
+
+    return datetime.datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S')
+
+
+def _parse_utc_offset(value):
+    """
+    Returns the UTC offset of the given Box API timestamp as a timedelta
+    """
+    match = UTC_OFFSET_RE.search(value or '')
+    if not match:
+        return datetime.timedelta(0)
+
+    sign, hours, minutes = match.groups()
+    offset = datetime.timedelta(hours=int(hours), minutes=int(minutes))
+
+    return -offset if sign == '-' else offset
+
+
+class _StreamPosition(object):
+    """
+    File-like wrapper that tracks the number of bytes written
+
+    zipfile requires tell(), which plain streams such as sockets and pipes do
+    not support.
+    """
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.position = 0
+
+    def flush(self):
+        pass
+
+    def tell(self):
+        return self.position
+
+    def write(self, data):
+        self.fileobj.write(data)
+        self.position += len(data)
+
+
+class _ZipArchive(object):
+    def __init__(self, fileobj):
+        self.zipfile = zipfile.ZipFile(
+            _StreamPosition(fileobj), 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+
+    def add(self, path, data, modified_at, is_dir=False):
+        if is_dir:
+            path += '/'
+
+        # zip stores local time, so the timestamp's offset is not applied
+        local_time = _parse_timestamp(modified_at)
+        date_time = max(local_time, datetime.datetime(1980, 1, 1)).timetuple()[:6]
+        info = zipfile.ZipInfo(path, date_time)
+        if is_dir:
+            info.external_attr = 0o40755 << 16
+        else:
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+
+        self.zipfile.writestr(info, data)
+
+    def close(self):
+        self.zipfile.close()
+
+
+class _TarArchive(object):
+    def __init__(self, fileobj):
+        # Box names are unicode; store them as UTF-8 whatever the local file system encoding
+        self.tarfile = tarfile.open(fileobj=fileobj, mode='w|', encoding='utf-8')
+
+    def add(self, path, data, modified_at, is_dir=False):
+        info = tarfile.TarInfo(path)
+        utc_time = _parse_timestamp(modified_at) - _parse_utc_offset(modified_at)
+        info.mtime = calendar.timegm(utc_time.timetuple())
+
+        if is_dir:
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            self.tarfile.addfile(info)
+        else:
+            info.size = len(data)
+            info.mode = 0o644
+            self.tarfile.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self.tarfile.close()
+
+
+ARCHIVE_FORMATS = {
+    'zip': _ZipArchive,
+    'tar': _TarArchive,
+}
+
 
 class Client(object):
-    def __init__(self, oauth2_client):
+    def __init__(self, oauth2_client, hedging=None, tracer=None):
         """
         Box client constructor
         :param oauth2_client: OAuth2Client instance
+        :param hedging: Optional, HedgingPolicy to reduce the latency of slow GET requests
+        :param tracer: Optional, Tracer to record spans of method calls and requests with
         :return:
         """
+        if hedging is not None:
+            oauth2_client = _HedgedSession(oauth2_client, hedging)
+
+        if tracer is not None:
+            oauth2_client = _TracedSession(oauth2_client, tracer)
+
         self.oauth2_client = oauth2_client
+        self.tracer = tracer
+
+    def _annotate(self, **attributes):
+        """
+        Sets attributes on the current span when tracing
+        """
+        if self.tracer is not None:
+            self.tracer.annotate(**attributes)
 
+    def _annotate_bytes_sent(self, fileobj):
+        """
+        Sets the size of the file being sent on the current span when tracing
+        """
+        if self.tracer is None:
+            return
+
+        size = _remaining_bytes(fileobj)
+        if size is not None:
+            self.tracer.annotate(bytes_sent=size)
+
+    def _bind(self, func):
+        """
+        Returns func wrapped to run within the current span when tracing, for use on worker threads
+        """
+        if self.tracer is None:
+            return func
+
+        return self.tracer.bind(func)
+
+    @traced
     def add_tags(self, item, tags):
         """
         Adds tags to the given item
@@ -38,6 +334,7 @@ class Client(object):
         :return: New list of tags
         """
         current_tags = self.get_tags(item)
+        self._annotate(extra_lookup=True)
 
         update = False
         for tag in tags:
@@ -50,6 +347,60 @@ class Client(object):
 
         return current_tags
 
+    @traced
+    def copy(self, item, parent, name=None, conflict=None):
+        """
+        Copies a file or folder into the given parent
+
+        The copy is made by Box; folders are copied with everything in them.
+
+        :param item: Box API item dictionary; folders must have `type` set to `folder`
+        :param parent: Box API folder item dictionary to copy into
+        :param name: Optional, the copy's name
+        :param conflict: Optional, what to do when the name is in use: CONFLICT_SKIP, CONFLICT_RENAME or
+                         CONFLICT_OVERWRITE.  By default the HTTPError is raised.
+        :return: Box API item dictionary of the copy, None when skipped
+        """
+        _check_conflict_policy(conflict)
+
+        url = (FOLDER_COPY_URL if _is_folder(item) else FILE_COPY_URL).format(item['id'])
+
+        def request(_name):
+            payload = {
+                'parent': {
+                    'id': parent['id'],
+                },
+            }
+
+            if _name:
+                payload['name'] = _name
+
+            response = self.oauth2_client.post(url, data=json.dumps(payload))
+            response.raise_for_status()
+
+            return response.json()
+
+        return self._handle_conflict(request, name, conflict)
+
+    @traced
+    def copy_many(self, items, parent, conflict=None, workers=DEFAULT_WORKERS):
+        """
+        Generator that copies many items into the given parent concurrently
+
+        :param items: iterable of Box API item dictionaries, see copy()
+        :param parent: Box API folder item dictionary to copy into
+        :param conflict: Optional, what to do when a name is in use, see copy()
+        :param workers: How many items to copy concurrently
+        :return: Generator of (item, copy) tuples in completion order
+        """
+        _check_conflict_policy(conflict)
+
+        def apply(item):
+            return item, self.copy(item, parent, conflict=conflict)
+
+        return _imap_unordered(self._bind(apply), items, workers)
+
+    @traced
     def create_folder(self, name, parent):
         """
         Creates a folder within the given parent
@@ -69,6 +420,32 @@ class Client(object):
 
         return response.json()
 
+    @traced
+    def create_metadata_template(self, scope, template_key, display_name, fields, hidden=False):
+        """
+        Creates a metadata template
+
+        :param scope: The template's scope, e.g. `enterprise`
+        :param template_key: The template's key
+        :param display_name: The template's display name
+        :param fields: List of Box API template field dictionaries
+        :param hidden: Whether the template is hidden from users
+        :return: The Box API response JSON data
+        """
+        payload = json.dumps({
+            'scope': scope,
+            'templateKey': template_key,
+            'displayName': display_name,
+            'fields': fields,
+            'hidden': hidden,
+        })
+
+        response = self.oauth2_client.post(CREATE_METADATA_TEMPLATE_URL, data=payload)
+        response.raise_for_status()
+
+        return response.json()
+
+    @traced
     def delete(self, item):
         """
         Deletes a file
@@ -83,6 +460,7 @@ class Client(object):
 
         self.oauth2_client.delete(url, headers=headers)
 
+    @traced
     def delete_folder(self, item, recursive=False):
         """
         Deletes a folder
@@ -100,6 +478,154 @@ class Client(object):
 
         self.oauth2_client.delete(url, params=params)
 
+    @traced
+    def download(self, item, fileobj, chunk_size=DOWNLOAD_CHUNK_SIZE, offset=0):
+        """
+        Downloads a file's contents into the given file-like object
+
+        When an offset is given but Box sends the whole file instead of the
+        requested range, fileobj is truncated and written from the start.
+
+        :param item: Box API item dictionary
+        :param fileobj: a writable file-like object, seekable when an offset is given
+        :param chunk_size: How many bytes to read at a time
+        :param offset: Optional, the byte offset to start from, e.g. to resume a partial download
+        :return: The number of bytes written
+        """
+        url = FILE_CONTENT_URL.format(item['id'])
+
+        if offset:
+            response = self.oauth2_client.get(url, stream=True, headers={'Range': 'bytes={}-'.format(offset)})
+        else:
+            response = self.oauth2_client.get(url, stream=True)
+
+        response.raise_for_status()
+
+        if offset and response.status_code != 206:
+            fileobj.seek(0)
+            fileobj.truncate()
+
+        return self._copy_response(response, fileobj, chunk_size)
+
+    def _copy_response(self, response, fileobj, chunk_size):
+        size = 0
+        for chunk in response.iter_content(chunk_size):
+            fileobj.write(chunk)
+            size += len(chunk)
+
+        return size
+
+    @traced
+    def export_folder(self, folder, out, archive_format='zip', server_side=True,
+                      workers=DEFAULT_WORKERS, max_in_flight_bytes=MAX_IN_FLIGHT_BYTES):
+        """
+        Writes an archive of the folder and everything in it to the given stream
+
+        Zip archives are first requested from Box's zip download endpoint.  When
+        that is not available for the account, and for tar archives, the
+        archive is assembled here: file contents are downloaded concurrently,
+        holding at most `max_in_flight_bytes` in memory (a larger file is
+        held on its own), and written to the archive in listing order.
+        Nothing is written to disk; `out` does not need to be seekable.
+
+        :param folder: Box API folder item dictionary
+        :param out: a writable file-like object
+        :param archive_format: `zip` or `tar`
+        :param server_side: Whether to try Box's zip download endpoint first
+        :param workers: How many files to download concurrently
+        :param max_in_flight_bytes: How many bytes of file contents to hold in memory
+        :return: None
+        """
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError('unknown archive format {!r}'.format(archive_format))
+
+        if 'name' not in folder or 'modified_at' not in folder:
+            folder = dict(folder, **self.folder_info(folder, fields='name,modified_at'))
+
+        if server_side and archive_format == 'zip':
+            try:
+                response = self._zip_download(folder)
+            except HTTPError:
+                pass  # not available, assemble the archive here instead
+            else:
+                self._copy_response(response, out, DOWNLOAD_CHUNK_SIZE)
+                return
+
+        archive = ARCHIVE_FORMATS[archive_format](out)
+
+        def get_content(item):
+            fileobj = io.BytesIO()
+            self.download(item, fileobj)
+            return fileobj.getvalue()
+
+        pool = ThreadPool(workers)
+        pending = deque()
+        in_flight = [0]
+
+        def write_next():
+            path, item, size, result = pending.popleft()
+            modified_at = item.get('modified_at')
+
+            if result is None:
+                archive.add(path, b'', modified_at, is_dir=True)
+            else:
+                archive.add(path, result.get(), modified_at)
+
+            in_flight[0] -= size
+
+        try:
+            for path, item in self._walk(folder, folder['name']):
+                if item['type'] == 'folder':
+                    pending.append((path, item, 0, None))
+                    continue
+
+                size = item.get('size') or 0
+                while pending and (len(pending) >= workers or in_flight[0] + size > max_in_flight_bytes):
+                    write_next()
+
+                pending.append((path, item, size, pool.apply_async(self._bind(get_content), (item,))))
+                in_flight[0] += size
+
+            while pending:
+                write_next()
+        finally:
+            pool.terminate()
+
+        archive.close()
+
+    def _walk(self, folder, path):
+        """
+        Generator for (path, item) tuples of the folder and everything in it, depth first
+        """
+        yield path, dict(folder, type='folder')
+
+        items = self.folder_items(folder, limit=sys.maxsize, fields='name,size,modified_at')
+        for item in items:
+            item_path = u'{}/{}'.format(path, item['name'])
+
+            if item['type'] == 'folder':
+                for entry in self._walk(item, item_path):
+                    yield entry
+            elif item['type'] == 'file':
+                yield item_path, item
+
+    def _zip_download(self, folder):
+        payload = json.dumps({
+            'download_file_name': folder['name'],
+            'items': [
+                {'type': 'folder', 'id': str(folder['id'])},
+            ],
+        })
+
+        response = self.oauth2_client.post(ZIP_DOWNLOADS_URL, data=payload)
+        response.raise_for_status()
+
+        response = self.oauth2_client.get(response.json()['download_url'], stream=True)
+        response.raise_for_status()
+
+        return response
+
+    @traced
     def file_info(self, item, fields=None):
         """
         Returns the requested file's information
@@ -112,6 +638,25 @@ class Client(object):
 
         return self.item_info(url, fields=fields)
 
+    @traced
+    def file_info_many(self, items, fields=None, missing=None, workers=DEFAULT_WORKERS):
+        """
+        Generator for the information of many files
+
+        Items are deduplicated by id and requested concurrently; results are
+        yielded as they arrive, so `dict(client.file_info_many(items))` gives a
+        mapping of id to information.  Files that do not exist (HTTP 404) are
+        not yielded.
+
+        :param items: iterable of Box API item dictionaries
+        :param fields: Optional, restrict the requests to the given fields
+        :param missing: Optional, list to append the ids of files that do not exist to
+        :param workers: How many requests to make concurrently
+        :return: Generator of (id, information) tuples
+        """
+        return self._info_many(FILE_URL, items, fields, missing, workers)
+
+    @traced
     def folder_info(self, item, fields=None):
         """
         Returns the requested folder's information
@@ -124,12 +669,62 @@ class Client(object):
 
         return self.item_info(url, fields=fields)
 
-    def folder_items(self, parent=None, limit=100, offset=0):
+    @traced
+    def folder_info_many(self, items, fields=None, missing=None, workers=DEFAULT_WORKERS):
+        """
+        Generator for the information of many folders, see file_info_many()
+
+        :param items: iterable of Box API item dictionaries
+        :param fields: Optional, restrict the requests to the given fields
+        :param missing: Optional, list to append the ids of folders that do not exist to
+        :param workers: How many requests to make concurrently
+        :return: Generator of (id, information) tuples
+        """
+        return self._info_many(FOLDER_URL, items, fields, missing, workers)
+
+    def _info_many(self, url_format, items, fields, missing, workers):
+        params = {}
+
+        if fields:
+            params['fields'] = fields
+
+        def unique_ids():
+            seen = set()
+            for item in items:
+                key = str(item['id'])
+                if key not in seen:
+                    seen.add(key)
+                    yield item['id']
+
+        def get_info(item_id):
+            try:
+                response = self.oauth2_client.get(url_format.format(item_id), params=params)
+                response.raise_for_status()
+            except HTTPError as exc:
+                if exc.response.status_code != 404:
+                    raise
+
+                return item_id, None
+
+            return item_id, response.json()
+
+        for item_id, info in _imap_unordered(self._bind(get_info), unique_ids(), workers):
+            if info is None:
+                if missing is not None:
+                    missing.append(item_id)
+
+                continue
+
+            yield item_id, info
+
+    @traced
+    def folder_items(self, parent=None, limit=100, offset=0, fields=None):
         """
         Generator for items in given parent
         :param parent: optionarl Box API folder item dictionary
         :param limit: How many items to retrieve
         :param offset: Item offset
+        :param fields: Optional, restrict the items to the given fields
         :return: Generator of Box API item dictionaries
         """
         if parent is None:
@@ -145,6 +740,9 @@ class Client(object):
                 'offset': offset+count,
             }
 
+            if fields:
+                params['fields'] = fields
+
             response = self.oauth2_client.get(url, params=params)
             response.raise_for_status()
 
@@ -163,12 +761,32 @@ class Client(object):
             if count >= total_count:
                 break
 
+    @traced
     def get_etag(self, item):
         return self.file_info(item, fields='etag')['etag']
 
+    @traced
     def get_tags(self, item):
         return self.file_info(item, fields='tags')['tags']
 
+    @traced
+    def get_metadata(self, item, scope, template_key):
+        """
+        Returns the item's metadata instance for the given template
+
+        :param item: Box API item dictionary
+        :param scope: The template's scope, e.g. `enterprise`
+        :param template_key: The template's key
+        :return: Box API metadata instance dictionary
+        """
+        url = FILE_METADATA_URL.format(item['id'], scope, template_key)
+
+        response = self.oauth2_client.get(url)
+        response.raise_for_status()
+
+        return response.json()
+
+    @traced
     def item_info(self, url, fields=None):
         """
         Returns file information for the given item
@@ -186,6 +804,206 @@ class Client(object):
 
         return self.oauth2_client.get(url, params=params).json()
 
+    @traced
+    def metadata_query(self, from_template, ancestor_folder, query=None, query_params=None,
+                       fields=None, order_by=None, limit=None):
+        """
+        Generator for items whose metadata matches the given query
+
+        The query is run by Box against its metadata index, e.g.:
+
+            client.metadata_query(
+                'enterprise_123.classification', ROOT_FOLDER,
+                query='status = :status', query_params={'status': 'pending'},
+            )
+
+        :param from_template: The template to query, as `scope.templateKey`
+        :param ancestor_folder: Box API folder item dictionary to search within
+        :param query: Optional, the query's condition, referencing query_params as `:name`
+        :param query_params: Optional, dictionary of values for the query's parameters
+        :param fields: Optional, list of fields to return, e.g. ['name', 'metadata.enterprise_123.classification.status']
+        :param order_by: Optional, list of Box API order by dictionaries
+        :param limit: Optional, how many items to retrieve; all of them when None
+        :return: Generator of Box API item dictionaries
+        """
+        body = {
+            'from': from_template,
+            'ancestor_folder_id': str(ancestor_folder['id']),
+        }
+
+        if query:
+            body['query'] = query
+
+        if query_params:
+            body['query_params'] = query_params
+
+        if fields:
+            body['fields'] = fields
+
+        if order_by:
+            body['order_by'] = order_by
+
+        count = 0
+        marker = None
+        while limit is None or count < limit:
+            body['limit'] = MAX_METADATA_RESULTS if limit is None else min(MAX_METADATA_RESULTS, limit - count)
+
+            if marker:
+                body['marker'] = marker
+
+            response = self.oauth2_client.post(METADATA_QUERY_URL, data=json.dumps(body))
+            response.raise_for_status()
+
+            json_data = response.json()
+
+            entries = json_data['entries']
+            for entry in entries:
+                yield entry
+
+            count += len(entries)
+
+            marker = json_data.get('next_marker')
+            if not marker:
+                break
+
+    @traced
+    def metadata_template(self, scope, template_key):
+        """
+        Returns the requested metadata template
+
+        :param scope: The template's scope, e.g. `enterprise`
+        :param template_key: The template's key
+        :return: Box API metadata template dictionary
+        """
+        url = METADATA_TEMPLATE_URL.format(scope, template_key)
+
+        response = self.oauth2_client.get(url)
+        response.raise_for_status()
+
+        return response.json()
+
+    @traced
+    def metadata_templates(self, scope='enterprise'):
+        """
+        Generator for the metadata templates in the given scope
+
+        :param scope: The templates' scope, e.g. `enterprise` or `global`
+        :return: Generator of Box API metadata template dictionaries
+        """
+        url = METADATA_SCOPE_URL.format(scope)
+
+        params = {
+            'limit': MAX_METADATA_RESULTS,
+        }
+
+        while True:
+            response = self.oauth2_client.get(url, params=params)
+            response.raise_for_status()
+
+            json_data = response.json()
+
+            for entry in json_data['entries']:
+                yield entry
+
+            marker = json_data.get('next_marker')
+            if not marker:
+                break
+
+            params['marker'] = marker
+
+    @traced
+    def move(self, item, parent, name=None, etag=None, conflict=None):
+        """
+        Moves a file or folder into the given parent
+
+        :param item: Box API item dictionary; folders must have `type` set to `folder`
+        :param parent: Box API folder item dictionary to move into
+        :param name: Optional, the item's new name
+        :param etag: Optional, only move the item if it still has this etag
+        :param conflict: Optional, what to do when the name is in use, see copy()
+        :return: Box API item dictionary, None when skipped
+        """
+        _check_conflict_policy(conflict)
+
+        url = (FOLDER_URL if _is_folder(item) else FILE_URL).format(item['id'])
+
+        headers = {}
+        if etag:
+            headers['If-Match'] = etag
+
+        def request(_name):
+            payload = {
+                'parent': {
+                    'id': parent['id'],
+                },
+            }
+
+            if _name:
+                payload['name'] = _name
+
+            response = self.oauth2_client.put(url, data=json.dumps(payload), headers=headers)
+            response.raise_for_status()
+
+            return response.json()
+
+        return self._handle_conflict(request, name, conflict)
+
+    @traced
+    def move_many(self, items, parent, conflict=None, workers=DEFAULT_WORKERS):
+        """
+        Generator that moves many items into the given parent concurrently
+
+        Items carrying an `etag` are only moved when they still have it.
+
+        :param items: iterable of Box API item dictionaries, see move()
+        :param parent: Box API folder item dictionary to move into
+        :param conflict: Optional, what to do when a name is in use, see copy()
+        :param workers: How many items to move concurrently
+        :return: Generator of (item, moved item) tuples in completion order
+        """
+        _check_conflict_policy(conflict)
+
+        def apply(item):
+            return item, self.move(item, parent, etag=item.get('etag'), conflict=conflict)
+
+        return _imap_unordered(self._bind(apply), items, workers)
+
+    def _handle_conflict(self, request, name, conflict):
+        """
+        Calls request with the given name, handling 409 name conflicts per the conflict policy
+        """
+        attempt = 0
+        _name = name
+        while True:
+            try:
+                return request(_name)
+            except HTTPError as exc:
+                if conflict is None or exc.response.status_code != 409:
+                    raise
+
+                conflicts = exc.response.json()['context_info']['conflicts']
+                if isinstance(conflicts, list):
+                    conflicts = conflicts[0]
+
+                if conflict == CONFLICT_SKIP:
+                    return None
+                elif conflict == CONFLICT_RENAME:
+                    if attempt >= MAX_RENAMES:
+                        raise
+
+                    attempt += 1
+                    _name = _renamed(name or conflicts['name'], attempt)
+                else:  # CONFLICT_OVERWRITE
+                    if attempt:
+                        raise
+
+                    attempt += 1
+                    if _is_folder(conflicts):
+                        self.delete_folder(conflicts, recursive=True)
+                    else:
+                        self.delete(conflicts)
+
+    @traced
     def remove_tags(self, item, tags):
         """
         Removes tags from the given item
@@ -195,6 +1013,7 @@ class Client(object):
         :return: New list of tags
         """
         current_tags = self.get_tags(item)
+        self._annotate(extra_lookup=True)
 
         update = False
         new_tags = []
@@ -210,29 +1029,262 @@ class Client(object):
 
         return new_tags
 
-    def set_tags(self, item, tags):
+    @traced
+    def search(self, query=None, item_type=None, file_extensions=None, ancestor_folders=None,
+               created_at_range=None, updated_at_range=None, fields=None, limit=100, offset=0,
+               prefetch=4):
+        """
+        Generator for items matching the given search
+
+        Filtering is done by Box, so only matching items are transferred.  Once
+        the first page is received, up to `prefetch` following pages are
+        requested concurrently.  Pages are not requested beyond `limit`, and
+        closing the generator stops any outstanding requests.
+
+        :param query: Optional, the string to search for
+        :param item_type: Optional, one of `file`, `folder` or `web_link`
+        :param file_extensions: Optional, list of file extensions, e.g. ['pdf', 'png']
+        :param ancestor_folders: Optional, list of Box API folder item dictionaries to search within
+        :param created_at_range: Optional, (start, end) tuple of datetimes; either may be None
+        :param updated_at_range: Optional, (start, end) tuple of datetimes; either may be None
+        :param fields: Optional, restrict the results to the given fields
+        :param limit: How many items to retrieve
+        :param offset: Item offset, must be a multiple of the page size
+        :param prefetch: How many pages to request concurrently
+        :return: Generator of Box API item dictionaries
+        """
+        params = {}
+
+        if query:
+            params['query'] = query
+
+        if item_type:
+            params['type'] = item_type
+
+        if file_extensions:
+            params['file_extensions'] = ','.join(file_extensions)
+
+        if ancestor_folders:
+            params['ancestor_folder_ids'] = ','.join(str(folder['id']) for folder in ancestor_folders)
+
+        if created_at_range:
+            params['created_at_range'] = _date_range(created_at_range)
+
+        if updated_at_range:
+            params['updated_at_range'] = _date_range(updated_at_range)
+
+        if fields:
+            params['fields'] = fields
+
+        # Box requires the offset to be a multiple of the limit, so every page has the same size
+        page_size = min(MAX_SEARCH_RESULTS, limit)
+
+        def get_page(_offset):
+            _params = dict(params, limit=page_size, offset=_offset)
+
+            response = self.oauth2_client.get(SEARCH_URL, params=_params)
+            response.raise_for_status()
+
+            return response.json()
+
+        json_data = get_page(offset)
+
+        end = min(offset + limit, json_data['total_count'])
+        pages = _prefetch(self._bind(get_page), range(offset + page_size, end, page_size), prefetch)
+
+        count = 0
+        try:
+            while json_data is not None:
+                for entry in json_data['entries'][:limit - count]:
+                    yield entry
+
+                count += len(json_data['entries'])
+                if count >= limit or not json_data['entries']:
+                    break
+
+                json_data = next(pages, None)
+        finally:
+            pages.close()
+
+    @traced
+    def set_metadata(self, item, scope, template_key, data):
+        """
+        Sets the item's metadata for the given template
+
+        The metadata instance is created when the item does not have one yet,
+        otherwise the given keys are added to or replaced in the existing
+        instance.
+
+        :param item: Box API item dictionary
+        :param scope: The template's scope, e.g. `enterprise`
+        :param template_key: The template's key
+        :param data: Dictionary of template field keys to values
+        :return: Box API metadata instance dictionary
+        """
+        url = FILE_METADATA_URL.format(item['id'], scope, template_key)
+
+        try:
+            response = self.oauth2_client.post(url, data=json.dumps(data))
+            response.raise_for_status()
+        except HTTPError as exc:
+            if exc.response.status_code != 409:
+                raise
+
+            # the instance already exists; update it with a JSON patch instead
+            operations = [
+                {'op': 'add', 'path': '/{}'.format(key), 'value': value}
+                for key, value in sorted(data.items())
+            ]
+
+            headers = {
+                'Content-Type': 'application/json-patch+json',
+            }
+
+            response = self.oauth2_client.put(url, data=json.dumps(operations), headers=headers)
+            response.raise_for_status()
+
+        return response.json()
+
+    @traced
+    def set_metadata_many(self, operations, failed=None, workers=DEFAULT_WORKERS):
+        """
+        Generator that sets metadata on many items concurrently
+
+        An operation that fails does not stop the others; it is not yielded.
+
+        :param operations: iterable of (item, scope, template_key, data) tuples, see set_metadata()
+        :param failed: Optional, list to append an (operation, HTTPError) tuple to for each failed operation
+        :param workers: How many items to update concurrently
+        :return: Generator of (item, Box API metadata instance dictionary) tuples in completion order
+        """
+        def apply(operation):
+            try:
+                return operation, self.set_metadata(*operation), None
+            except HTTPError as exc:
+                return operation, None, exc
+
+        for operation, instance, error in _imap_unordered(self._bind(apply), operations, workers):
+            if error is not None:
+                if failed is not None:
+                    failed.append((operation, error))
+
+                continue
+
+            yield operation[0], instance
+
+    @traced
+    def set_tags(self, item, tags, etag=None):
         """
         Sets the tags for the given item
 
         :param item: Box API item dictionary
         :param tags: List of tags
+        :param etag: Optional, only update the item if it still has this etag
         :return:
         """
         url = FILE_URL.format(item['id'])
 
-        params = {
-            'fields': 'tags',
-        }
-
         data = json.dumps({
             'tags': tags,
         })
 
-        self.oauth2_client.put(url, data=data)
+        if etag is None:
+            response = self.oauth2_client.put(url, data=data)
+        else:
+            response = self.oauth2_client.put(url, data=data, headers={'If-Match': etag})
+
+        response.raise_for_status()
 
+    @traced
+    def update_tags(self, operations, failed=None, workers=DEFAULT_WORKERS, retries=3):
+        """
+        Adds and removes tags on many items
+
+        Operations on the same item are merged so that each item is read at
+        most once and written at most once.  An item's current tags are taken
+        from the item dictionary when it carries both `tags` and `etag`,
+        otherwise they are fetched.  Writes are guarded with the item's etag;
+        when the item changed in the meantime (HTTP 412) its tags are fetched
+        again and the write is retried.  An item that cannot be updated, e.g.
+        because it does not exist or still changes after all retries, does not
+        stop the other items from being updated.
+
+        :param operations: iterable of (item, add, remove) tuples, where add and remove are lists of tags
+        :param failed: Optional, dictionary to store the HTTPError of each item that could not be updated by id
+        :param workers: How many items to update concurrently
+        :param retries: How many times to retry an item that changed during the update
+        :return: Dictionary mapping the id of each updated item to its new list of tags
+        """
+        merged = OrderedDict()
+        for item, add, remove in operations:
+            _item, _add, _remove = merged.setdefault(item['id'], (item, OrderedDict(), OrderedDict()))
+
+            for tag in add or []:
+                _remove.pop(tag, None)
+                _add[tag] = True
+
+            for tag in remove or []:
+                _add.pop(tag, None)
+                _remove[tag] = True
+
+        def apply(args):
+            item, add, remove = args
+            try:
+                return item['id'], self._update_tags(item, list(add), list(remove), retries), None
+            except HTTPError as exc:
+                return item['id'], None, exc
+
+        result = {}
+        for item_id, tags, error in _imap_unordered(self._bind(apply), merged.values(), workers):
+            if error is not None:
+                if failed is not None:
+                    failed[item_id] = error
+
+                continue
+
+            result[item_id] = tags
+
+        return result
+
+    def _update_tags(self, item, add, remove, retries):
+        tags = item.get('tags')
+        etag = item.get('etag')
+
+        attempt = 0
+        while True:
+            if tags is None or etag is None:
+                self._annotate(extra_lookup=True)
+                info = self.file_info(item, fields='tags,etag')
+                tags = info['tags']
+                etag = info['etag']
+
+            new_tags = [tag for tag in tags if tag not in remove]
+            for tag in add:
+                if tag not in new_tags:
+                    new_tags.append(tag)
+
+            if new_tags == tags:
+                return new_tags
+
+            try:
+                self.set_tags(item, new_tags, etag=etag)
+            except HTTPError as exc:
+                if exc.response.status_code != 412 or attempt >= retries:
+                    raise
+
+                attempt += 1
+                tags = etag = None
+            else:
+                return new_tags
+
+    @traced
     def update(self, item, fileobj, filename=None, etag=None, content_hash=None):
+        if not etag:
+            self._annotate(extra_lookup=True)
+            etag = self.get_etag(item)
+
         headers = {
-            'If-Match': etag or self.get_etag(item),
+            'If-Match': etag,
         }
 
         if content_hash:
@@ -247,6 +1299,8 @@ class Client(object):
             'filename': (filename, fileobj),
         }
 
+        self._annotate_bytes_sent(fileobj)
+
         url = UPDATE_FILE_URL.format(item['id'])
 
         response = self.oauth2_client.post(url, files=files, headers=headers)
@@ -254,18 +1308,27 @@ class Client(object):
 
         return response.json()
 
+    @traced
     def update_file_info(self, item, info, etag=None):
         url = FILE_URL.format(item['id'])
-        etag = etag or self.file_info(item, fields='etag')['etag']
+
+        if not etag:
+            self._annotate(extra_lookup=True)
+            etag = self.file_info(item, fields='etag')['etag']
 
         return self.update_info(url, info, etag)
 
+    @traced
     def update_folder_info(self, item, info, etag=None):
         url = FOLDER_URL.format(item['id'])
-        etag = etag or self.folder_info(item, fields='etag')['etag']
+
+        if not etag:
+            self._annotate(extra_lookup=True)
+            etag = self.folder_info(item, fields='etag')['etag']
 
         return self.update_info(url, info, etag)
 
+    @traced
     def update_info(self, url, info, etag):
         """
         Updates the given item's metadata, such as name, description, etc.
@@ -284,6 +1347,7 @@ class Client(object):
 
         return response.json()
 
+    @traced
     def upload(self, parent, fileobj, filename=None, content_hash=None):
         """
         Upload a file to the given parent
@@ -313,10 +1377,13 @@ class Client(object):
                 'Content-MD5': content_hash,
             })
 
+        self._annotate_bytes_sent(fileobj)
+
         response = self.oauth2_client.post(UPLOAD_FILE_URL, data=data, files=files, headers=headers)
 
         return response.json()
 
+    @traced
     def upload_or_update(self, parent, fileobj, filename=None, content_hash=None):
         """
         Upload a file to the given parent
@@ -331,6 +1398,8 @@ class Client(object):
         :return: (json, uploaded) tuple, Box API response JSON data and whether the file was uploaded.
                  When False, the file was updated.
         """
+        self._annotate_bytes_sent(fileobj)
+
         try:
             response_json = self.upload(
                 parent, fileobj, filename=filename, content_hash=content_hash)
@@ -338,6 +1407,8 @@ class Client(object):
             if exc.response.status_code != 409:
                 raise
 
+            self._annotate(conflict=True)
+
             error_json = exc.response.json()
             existing_file_id = error_json['context_info']['conflicts']['id']
             existing_file_etag = error_json['context_info']['conflicts']['etag']
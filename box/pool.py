@@ -0,0 +1,249 @@
+from __future__ import absolute_import
+
+import bisect
+import hashlib
+import re
+import threading
+import time
+
+from requests.exceptions import HTTPError
+
+from .models import Client
+
+# the item id in a Box API url, e.g. https://api.box.com/2.0/folders/123/items
+ITEM_ID_RE = re.compile(r'/(?:files|folders)/(\d+)')
+
+# route requests for the same item to the same credential
+ROUTE_HASH = 'hash'
+
+# route requests to the credential with the fewest requests in flight
+ROUTE_LEAST_LOADED = 'least_loaded'
+
+# points per credential on the consistent hash ring
+VIRTUAL_NODES = 64
+
+# seconds to rest a throttled credential when Box does not say how long
+DEFAULT_RETRY_AFTER = 1.0
+
+# consecutive failures after which a credential is rested
+MAX_FAILURES = 3
+
+# seconds to rest a failing credential
+FAILURE_BACKOFF = 30.0
+
+
+def _hash(key):
+    return int(hashlib.md5(key.encode('utf8')).hexdigest()[:8], 16)
+
+
+class _Credential(object):
+    def __init__(self, oauth2_client):
+        self.oauth2_client = oauth2_client
+
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.failures = 0
+        self.unavailable_until = 0
+
+
+class _RoutingSession(object):
+    """
+    Stands in for an oauth2_client, sending each request with one of several credentials
+
+    A credential that is throttled (HTTP 429) is rested for the time Box asks
+    for and the request is sent again with another credential.  A credential
+    that fails repeatedly (HTTP 5xx or connection errors) is rested for
+    FAILURE_BACKOFF seconds.  Rested credentials are only used when all
+    credentials are resting.
+    """
+    def __init__(self, oauth2_clients, routing=ROUTE_HASH, clock=time.time, sleep=time.sleep):
+        if not oauth2_clients:
+            raise ValueError('at least one oauth2_client is required')
+
+        if routing not in (ROUTE_HASH, ROUTE_LEAST_LOADED):
+            raise ValueError('unknown routing {!r}'.format(routing))
+
+        self.credentials = [_Credential(oauth2_client) for oauth2_client in oauth2_clients]
+        self.routing = routing
+        self.clock = clock
+        self.sleep = sleep
+
+        self.lock = threading.Lock()
+
+        ring = sorted(
+            (_hash('{}-{}'.format(index, replica)), index)
+            for index in range(len(self.credentials))
+            for replica in range(VIRTUAL_NODES)
+        )
+        self.ring_hashes = [point for point, index in ring]
+        self.ring_indexes = [index for point, index in ring]
+
+    def delete(self, url, **kwargs):
+        return self.request('delete', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('get', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('post', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('put', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        attempts = len(self.credentials) + 1
+        for attempt in range(attempts):
+            credential = self._acquire(url)
+
+            error = None
+            try:
+                response = getattr(credential.oauth2_client, method)(url, **kwargs)
+            except HTTPError as exc:
+                error = exc
+                response = exc.response
+            except Exception:
+                self._release(credential, None)
+                raise
+
+            self._release(credential, response)
+
+            if response is not None and response.status_code == 429 and attempt < attempts - 1:
+                self._rewind(kwargs)
+                continue
+
+            if error is not None:
+                raise error
+
+            return response
+
+    def _acquire(self, url):
+        """
+        Returns the credential to send a request for the given url with
+        """
+        with self.lock:
+            now = self.clock()
+
+            candidates = [self.credentials[index] for index in self._order(url)]
+            available = [credential for credential in candidates if credential.unavailable_until <= now]
+
+            # when every credential is resting, wait for the one that is available first
+            if available:
+                credential = available[0]
+            else:
+                credential = min(candidates, key=lambda candidate: candidate.unavailable_until)
+
+            credential.in_flight += 1
+            credential.requests += 1
+
+        wait = credential.unavailable_until - now
+        if wait > 0:
+            self.sleep(wait)
+
+        return credential
+
+    def _order(self, url):
+        """
+        Returns the credential indexes in the order they should be tried for the given url
+        """
+        match = ITEM_ID_RE.search(url)
+
+        if self.routing == ROUTE_HASH and match:
+            start = bisect.bisect(self.ring_hashes, _hash(match.group(1)))
+
+            order = []
+            for offset in range(len(self.ring_indexes)):
+                index = self.ring_indexes[(start + offset) % len(self.ring_indexes)]
+                if index not in order:
+                    order.append(index)
+
+                    if len(order) == len(self.credentials):
+                        break
+
+            return order
+
+        return sorted(range(len(self.credentials)), key=lambda index: self.credentials[index].in_flight)
+
+    def _release(self, credential, response):
+        """
+        Records the outcome of a request made with the given credential
+        """
+        status_code = None if response is None else response.status_code
+
+        with self.lock:
+            credential.in_flight -= 1
+
+            if status_code == 429:
+                credential.throttled += 1
+
+                try:
+                    retry_after = float(response.headers.get('Retry-After'))
+                except (TypeError, ValueError):
+                    retry_after = DEFAULT_RETRY_AFTER
+
+                credential.unavailable_until = self.clock() + retry_after
+            elif status_code is None or status_code >= 500:
+                credential.failures += 1
+
+                if credential.failures >= MAX_FAILURES:
+                    credential.unavailable_until = self.clock() + FAILURE_BACKOFF
+            else:
+                credential.failures = 0
+
+    def _rewind(self, kwargs):
+        """
+        Rewinds any files in the request so that it can be sent again
+        """
+        for value in (kwargs.get('files') or {}).values():
+            fileobj = value[1] if isinstance(value, tuple) else value
+            if hasattr(fileobj, 'seek'):
+                fileobj.seek(0, 0)
+
+
+class ClientPool(Client):
+    """
+    Box client that spreads its requests over several credentials
+
+    Throughput is otherwise capped by the rate limit of a single user; with a
+    pool, e.g. of app users, each credential's limit applies separately.
+    All credentials must have access to the items being worked on.
+
+    By default requests for the same file or folder are sent with the same
+    credential, chosen by consistent hashing on the item id, falling back to
+    the next credential on the ring when it is throttled or failing.  Requests
+    without an item id in the url, e.g. uploads and searches, and all requests
+    with ROUTE_LEAST_LOADED routing, are sent with the credential that has
+    the fewest requests in flight.
+    """
+    def __init__(self, oauth2_clients, routing=ROUTE_HASH, hedging=None, tracer=None):
+        """
+        Box client pool constructor
+        :param oauth2_clients: list of OAuth2Client instances
+        :param routing: ROUTE_HASH or ROUTE_LEAST_LOADED
+        :param hedging: Optional, HedgingPolicy, see Client
+        :param tracer: Optional, Tracer, see Client
+        :return:
+        """
+        super(ClientPool, self).__init__(
+            _RoutingSession(oauth2_clients, routing=routing), hedging=hedging, tracer=tracer)
+
+    def stats(self):
+        """
+        Returns the request counters of each credential
+
+        :return: List of dictionaries, in the order the oauth2_clients were given
+        """
+        session = self.oauth2_client
+        now = session.clock()
+
+        with session.lock:
+            return [
+                {
+                    'requests': credential.requests,
+                    'in_flight': credential.in_flight,
+                    'throttled': credential.throttled,
+                    'failures': credential.failures,
+                    'available': credential.unavailable_until <= now,
+                }
+                for credential in session.credentials
+            ]
@@ -0,0 +1,261 @@
+import hashlib
+import json
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+
+from box import Client
+from box.cli import PART_SUFFIX, main
+from box.models import (
+    FILE_CONTENT_URL, FILE_URL, FOLDER_COPY_URL, FOLDER_LIST_URL, FOLDER_URL, UPLOAD_FILE_URL)
+
+
+# a Box name and the same name as Python 2 gives it for a UTF-8 file system
+NAME = u'caf\xe9.txt'
+LOCAL_NAME = NAME.encode('utf-8')
+
+
+def sha1(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+class Output(object):
+    def __init__(self):
+        self.lines = []
+
+    def write(self, data):
+        self.lines.extend(line for line in data.split('\n') if line)
+
+
+class CommandTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+        self.listings = {}
+        self.contents = {}
+        self.range_status = 206
+
+        self.oauth2_client = mock.Mock()
+        self.oauth2_client.get.side_effect = self.get
+
+        self.client = Client(self.oauth2_client)
+        self.out = Output()
+        self.err = Output()
+
+    def get(self, url, **kwargs):
+        response = mock.Mock()
+        if url in self.listings:
+            entries = self.listings[url]
+            response.json.return_value = {'total_count': len(entries), 'entries': entries}
+        else:
+            response.status_code = self.range_status if 'Range' in kwargs.get('headers', {}) else 200
+            response.iter_content.return_value = self.contents[url]
+        return response
+
+    def add_folder(self, folder_id, entries):
+        self.listings[FOLDER_LIST_URL.format(folder_id)] = entries
+
+    def run_command(self, *argv):
+        return main(list(argv), client=self.client, out=self.out, err=self.err)
+
+    def write_file(self, name, data):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as fileobj:
+            fileobj.write(data)
+
+        return path
+
+    def test_ls_recursive_json(self):
+        self.add_folder(0, [{'type': 'folder', 'id': 2, 'name': 'docs'}])
+        self.add_folder(2, [{'type': 'file', 'id': 3, 'name': 'a.txt', 'size': 3, 'sha1': 'x'}])
+
+        status = self.run_command('ls', '-R', '--json', '-q', '/')
+
+        self.assertEqual(0, status)
+        self.assertEqual([
+            {'path': '/docs', 'type': 'folder', 'id': 2},
+            {'path': '/docs/a.txt', 'type': 'file', 'id': 3, 'size': 3, 'sha1': 'x'},
+        ], [json.loads(line) for line in self.out.lines])
+        self.assertEqual([], self.err.lines)
+
+    def test_ls_streams(self):
+        """
+        Ensures items are printed as each page of a listing arrives
+        """
+        printed = []
+
+        def get(url, params):
+            printed.append(len(self.out.lines))
+
+            response = mock.Mock()
+            entries = [{'type': 'file', 'id': params['offset'], 'name': str(params['offset'])}]
+            response.json.return_value = {'total_count': 2, 'entries': entries}
+            return response
+
+        self.oauth2_client.get.side_effect = get
+
+        status = self.run_command('ls', '--json', '-q', '/')
+
+        self.assertEqual(0, status)
+        self.assertEqual(['/0', '/1'], [json.loads(line)['path'] for line in self.out.lines])
+        self.assertEqual([0, 1], printed)
+
+    def test_ls_unicode(self):
+        self.add_folder(0, [{'type': 'file', 'id': 3, 'name': NAME, 'size': 3}])
+
+        status = self.run_command('ls', '-q', '/')
+
+        self.assertEqual(0, status)
+        self.assertEqual(1, len(self.out.lines))
+        self.assertTrue(self.out.lines[0].endswith(u' /' + NAME))
+
+    def test_cp_upload(self):
+        """
+        Ensures files already in Box are skipped and others uploaded with their hash
+        """
+        self.add_folder(0, [{'type': 'folder', 'id': 2, 'name': 'Backups'}])
+        self.add_folder(2, [{'type': 'file', 'id': 3, 'name': 'a.txt', 'sha1': sha1(b'foo')}])
+
+        a = self.write_file('a.txt', b'foo')
+        b = self.write_file('b.txt', b'bar')
+
+        status = self.run_command('cp', '-j', '2', '--json', a, b, 'box:/Backups')
+
+        self.assertEqual(0, status)
+
+        events = sorted((json.loads(line) for line in self.out.lines), key=lambda event: event['target'])
+        self.assertEqual([
+            {'op': 'upload', 'target': 'box:/Backups/a.txt', 'skipped': True},
+            {'op': 'upload', 'target': 'box:/Backups/b.txt', 'bytes': 3},
+        ], events)
+
+        self.oauth2_client.post.assert_called_once_with(
+            UPLOAD_FILE_URL,
+            data={'parent_id': 2},
+            files={'filename': ('b.txt', mock.ANY)},
+            headers={'Content-MD5': sha1(b'bar')},
+        )
+        self.assertTrue(self.err.lines[0].startswith('1 done, 1 skipped, 0 failed; 3 bytes'))
+
+    def test_cp_download_resume(self):
+        self.add_folder(0, [{'type': 'file', 'id': 3, 'name': 'x.txt', 'size': 6, 'sha1': sha1(b'foobar')}])
+        self.contents[FILE_CONTENT_URL.format(3)] = [b'bar']
+
+        self.write_file('x.txt' + PART_SUFFIX, b'foo')
+
+        status = self.run_command('cp', '-q', 'box:/x.txt', self.tmp)
+
+        self.assertEqual(0, status)
+
+        with open(os.path.join(self.tmp, 'x.txt'), 'rb') as fileobj:
+            self.assertEqual(b'foobar', fileobj.read())
+
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, 'x.txt' + PART_SUFFIX)))
+        self.oauth2_client.get.assert_called_with(
+            FILE_CONTENT_URL.format(3), stream=True, headers={'Range': 'bytes=3-'})
+
+    def test_cp_download_resume_ignored(self):
+        """
+        Ensures a partial download starts over when the range is not honoured
+        """
+        self.add_folder(0, [{'type': 'file', 'id': 3, 'name': 'x.txt', 'size': 6, 'sha1': sha1(b'foobar')}])
+        self.contents[FILE_CONTENT_URL.format(3)] = [b'foobar']
+        self.range_status = 200
+
+        self.write_file('x.txt' + PART_SUFFIX, b'xyz')
+
+        status = self.run_command('cp', '-q', 'box:/x.txt', self.tmp)
+
+        self.assertEqual(0, status)
+
+        with open(os.path.join(self.tmp, 'x.txt'), 'rb') as fileobj:
+            self.assertEqual(b'foobar', fileobj.read())
+
+    @mock.patch('sys.getfilesystemencoding', return_value='utf-8')
+    def test_cp_download_unicode(self, getfilesystemencoding):
+        self.add_folder(0, [{'type': 'file', 'id': 3, 'name': NAME, 'size': 3, 'sha1': sha1(b'foo')}])
+        self.contents[FILE_CONTENT_URL.format(3)] = [b'foo']
+
+        status = self.run_command('cp', '-q', b'box:/' + LOCAL_NAME, self.tmp)
+
+        self.assertEqual(0, status)
+        self.assertEqual([LOCAL_NAME], os.listdir(self.tmp))
+        self.assertEqual([u'download {} (3 bytes)'.format(os.path.join(self.tmp, NAME))], self.out.lines)
+
+    def test_cp_download_checksum_mismatch(self):
+        self.add_folder(0, [{'type': 'file', 'id': 3, 'name': 'x.txt', 'size': 3, 'sha1': sha1(b'foo')}])
+        self.contents[FILE_CONTENT_URL.format(3)] = [b'bar']
+
+        status = self.run_command('cp', '-q', 'box:/x.txt', self.tmp)
+
+        self.assertEqual(1, status)
+        self.assertIn('checksum mismatch', self.out.lines[0])
+        self.assertEqual([], os.listdir(self.tmp))
+
+    def test_cp_remote_folder(self):
+        self.add_folder(0, [
+            {'type': 'folder', 'id': 2, 'name': 'docs'},
+            {'type': 'folder', 'id': 3, 'name': 'Backups'},
+        ])
+        self.add_folder(3, [])
+
+        status = self.run_command('cp', 'box:/docs', 'box:/Backups')
+
+        self.assertEqual(1, status)
+        self.assertEqual(['box: box:/docs: is a folder (use -r)'], self.err.lines)
+        self.assertFalse(self.oauth2_client.post.called)
+
+        status = self.run_command('cp', '-r', '-q', 'box:/docs', 'box:/Backups')
+
+        self.assertEqual(0, status)
+        self.oauth2_client.post.assert_called_once_with(
+            FOLDER_COPY_URL.format(2), data=json.dumps({'parent': {'id': 3}}))
+
+    def test_rm_folder(self):
+        self.add_folder(0, [{'type': 'folder', 'id': 2, 'name': 'old'}])
+
+        status = self.run_command('rm', '/old')
+
+        self.assertEqual(1, status)
+        self.assertEqual(['box: /old: is a folder (use -r)'], self.err.lines)
+        self.assertFalse(self.oauth2_client.delete.called)
+
+        status = self.run_command('rm', '-r', '-q', '/old')
+
+        self.assertEqual(0, status)
+        self.oauth2_client.delete.assert_called_once_with(FOLDER_URL.format(2), params={'recursive': True})
+
+    def test_sync_delete(self):
+        self.add_folder(0, [{'type': 'folder', 'id': 2, 'name': 'Backups'}])
+        self.add_folder(2, [
+            {'type': 'file', 'id': 3, 'name': 'a.txt', 'sha1': sha1(b'foo')},
+            {'type': 'file', 'id': 4, 'name': 'old.txt', 'etag': '1'},
+        ])
+
+        self.write_file('a.txt', b'foo')
+
+        status = self.run_command('sync', '-q', '--delete', self.tmp, 'box:/Backups')
+
+        self.assertEqual(0, status)
+        self.assertFalse(self.oauth2_client.post.called)
+        self.oauth2_client.delete.assert_called_once_with(FILE_URL.format(4), headers={'If-Match': '1'})
+
+    @mock.patch('sys.getfilesystemencoding', return_value='utf-8')
+    def test_sync_delete_unicode(self, getfilesystemencoding):
+        """
+        Ensures a local name is matched with the same Box name
+        """
+        self.add_folder(0, [{'type': 'folder', 'id': 2, 'name': 'Backups'}])
+        self.add_folder(2, [{'type': 'file', 'id': 3, 'name': NAME, 'sha1': sha1(b'foo')}])
+
+        self.write_file(LOCAL_NAME, b'foo')
+
+        status = self.run_command('sync', '--delete', self.tmp, 'box:/Backups')
+
+        self.assertEqual(0, status)
+        self.assertEqual([u'upload   box:/Backups/{} (up to date)'.format(NAME)], self.out.lines)
+        self.assertFalse(self.oauth2_client.post.called)
+        self.assertFalse(self.oauth2_client.delete.called)
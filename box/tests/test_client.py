@@ -1,12 +1,27 @@
+import datetime
 import functools
+import io
 import json
 import mock
+import tarfile
+import threading
 import unittest
+import zipfile
 
 from requests.exceptions import HTTPError
 
 from box import Client
-from box.models import FILE_URL, FOLDER_URL, FOLDERS_URL, UPDATE_FILE_URL, UPLOAD_FILE_URL
+from box.models import (
+    CONFLICT_OVERWRITE, CONFLICT_RENAME, CONFLICT_SKIP, FILE_CONTENT_URL, FILE_COPY_URL, FILE_METADATA_URL,
+    FILE_URL, FOLDER_COPY_URL, FOLDER_LIST_URL, FOLDER_URL, FOLDERS_URL, METADATA_QUERY_URL, METADATA_SCOPE_URL,
+    SEARCH_URL, UPDATE_FILE_URL, UPLOAD_FILE_URL, ZIP_DOWNLOADS_URL)
+
+
+def conflict_error(conflicts):
+    response = mock.Mock(status_code=409)
+    response.json.return_value = {'context_info': {'conflicts': conflicts}}
+
+    return HTTPError(response=response)
 
 
 class ClientTestCase(unittest.TestCase):
@@ -46,6 +61,95 @@ class ClientTestCase(unittest.TestCase):
 
         self.assertEqual(False, self.oauth2_client.put.called)
 
+    def test_copy(self):
+        item = {'id': 1234}
+        parent = {'id': 1}
+
+        expected = {'id': 5678}
+        self.oauth2_client.post.return_value.json.return_value = expected
+
+        copied = self.client.copy(item, parent)
+
+        self.assertEqual(expected, copied)
+
+        self.oauth2_client.post.assert_called_with(
+            FILE_COPY_URL.format(item['id']), data=json.dumps({'parent': {'id': parent['id']}}))
+
+    def test_copy_folder_conflict(self):
+        item = {'id': 1234, 'type': 'folder'}
+        parent = {'id': 1}
+
+        self.oauth2_client.post.side_effect = conflict_error({'id': 1, 'type': 'folder', 'name': 'foo'})
+
+        self.assertRaises(HTTPError, self.client.copy, item, parent)
+
+        self.oauth2_client.post.assert_called_with(
+            FOLDER_COPY_URL.format(item['id']), data=json.dumps({'parent': {'id': parent['id']}}))
+
+    def test_copy_conflict_rename(self):
+        item = {'id': 1234}
+        parent = {'id': 1}
+
+        error = conflict_error([{'id': 1, 'type': 'file', 'name': 'foo.txt'}])
+        response = mock.Mock()
+        self.oauth2_client.post.side_effect = [error, error, response]
+
+        copied = self.client.copy(item, parent, conflict=CONFLICT_RENAME)
+
+        self.assertEqual(response.json.return_value, copied)
+
+        self.oauth2_client.post.assert_called_with(
+            FILE_COPY_URL.format(item['id']),
+            data=json.dumps({'parent': {'id': parent['id']}, 'name': 'foo (2).txt'}))
+
+    def test_copy_conflict_rename_unicode(self):
+        item = {'id': 1234}
+        parent = {'id': 1}
+
+        error = conflict_error([{'id': 1, 'type': 'file', 'name': u'r\xe9sum\xe9.pdf'}])
+        response = mock.Mock()
+        self.oauth2_client.post.side_effect = [error, response]
+
+        copied = self.client.copy(item, parent, conflict=CONFLICT_RENAME)
+
+        self.assertEqual(response.json.return_value, copied)
+
+        self.oauth2_client.post.assert_called_with(
+            FILE_COPY_URL.format(item['id']),
+            data=json.dumps({'parent': {'id': parent['id']}, 'name': u'r\xe9sum\xe9 (1).pdf'}))
+
+    def test_copy_conflict_skip(self):
+        self.oauth2_client.post.side_effect = conflict_error({'id': 1, 'type': 'file', 'name': 'foo.txt'})
+
+        copied = self.client.copy({'id': 1234}, {'id': 1}, conflict=CONFLICT_SKIP)
+
+        self.assertEqual(None, copied)
+        self.assertEqual(1, self.oauth2_client.post.call_count)
+
+    def test_copy_unknown_conflict_policy(self):
+        """
+        Ensures an unknown conflict policy is rejected before any request is made
+        """
+        self.assertRaises(ValueError, self.client.copy, {'id': 1234}, {'id': 1}, conflict='replace')
+        self.assertRaises(ValueError, self.client.move_many, [{'id': 1234}], {'id': 1}, conflict='replace')
+
+        self.assertEqual(False, self.oauth2_client.post.called)
+        self.assertEqual(False, self.oauth2_client.put.called)
+
+    def test_copy_many(self):
+        items = [{'id': i} for i in range(10)]
+
+        def post(url, data):
+            response = mock.Mock()
+            response.json.return_value = {'copy_of': url}
+            return response
+
+        self.oauth2_client.post.side_effect = post
+
+        copied = dict((item['id'], copy) for item, copy in self.client.copy_many(items, {'id': 1}))
+
+        self.assertEqual(dict((i, {'copy_of': FILE_COPY_URL.format(i)}) for i in range(10)), copied)
+
     def test_create_folder(self):
         name = 'foo'
         parent = {'id': 0, 'name': 'root'}
@@ -81,6 +185,126 @@ class ClientTestCase(unittest.TestCase):
         url = FOLDER_URL.format(folder_id)
         self.oauth2_client.delete.assert_called_with(url, params={'recursive': True})
 
+    def test_download(self):
+        item = {'id': 1234}
+
+        self.oauth2_client.get.return_value.iter_content.return_value = [b'foo', b'bar']
+
+        fileobj = io.BytesIO()
+        size = self.client.download(item, fileobj)
+
+        self.assertEqual(6, size)
+        self.assertEqual(b'foobar', fileobj.getvalue())
+
+        self.oauth2_client.get.assert_called_with(FILE_CONTENT_URL.format(item['id']), stream=True)
+
+    def test_download_offset(self):
+        item = {'id': 1234}
+
+        self.oauth2_client.get.return_value.status_code = 206
+        self.oauth2_client.get.return_value.iter_content.return_value = [b'bar']
+
+        fileobj = io.BytesIO(b'foo')
+        fileobj.seek(3)
+        self.assertEqual(3, self.client.download(item, fileobj, offset=3))
+
+        self.assertEqual(b'foobar', fileobj.getvalue())
+        self.oauth2_client.get.assert_called_with(
+            FILE_CONTENT_URL.format(item['id']), stream=True, headers={'Range': 'bytes=3-'})
+
+    def test_download_offset_ignored(self):
+        """
+        Ensures the file is written from the start when the range is not honoured
+        """
+        item = {'id': 1234}
+
+        self.oauth2_client.get.return_value.status_code = 200
+        self.oauth2_client.get.return_value.iter_content.return_value = [b'foobar']
+
+        fileobj = io.BytesIO(b'xyz')
+        fileobj.seek(3)
+        self.assertEqual(6, self.client.download(item, fileobj, offset=3))
+
+        self.assertEqual(b'foobar', fileobj.getvalue())
+
+    def _mock_tree(self):
+        """
+        Sets up GET responses for a folder with a file and a subfolder containing a file
+        """
+        modified_at = '2015-01-02T03:04:05-08:00'
+        listings = {
+            FOLDER_LIST_URL.format(1): [
+                {'type': 'file', 'id': 10, 'name': 'a.txt', 'size': 3, 'modified_at': modified_at},
+                {'type': 'folder', 'id': 2, 'name': 'sub', 'modified_at': modified_at},
+            ],
+            FOLDER_LIST_URL.format(2): [
+                {'type': 'file', 'id': 20, 'name': u'caf\xe9.txt', 'size': 6, 'modified_at': modified_at},
+            ],
+        }
+        contents = {
+            FILE_CONTENT_URL.format(10): [b'foo'],
+            FILE_CONTENT_URL.format(20): [b'bar', b'baz'],
+        }
+
+        def get(url, **kwargs):
+            response = mock.Mock()
+            if url in listings:
+                response.json.return_value = {'total_count': len(listings[url]), 'entries': listings[url]}
+            else:
+                response.iter_content.return_value = contents[url]
+            return response
+
+        self.oauth2_client.get.side_effect = get
+
+        return {'id': 1, 'name': 'root', 'modified_at': modified_at}
+
+    def test_export_folder_server_side(self):
+        folder = {'id': 1, 'name': 'root', 'modified_at': '2015-01-02T03:04:05-08:00'}
+
+        self.oauth2_client.post.return_value.json.return_value = {'download_url': 'https://dl.example.com/1'}
+        self.oauth2_client.get.return_value.iter_content.return_value = [b'PK', b'data']
+
+        out = io.BytesIO()
+        self.client.export_folder(folder, out)
+
+        self.assertEqual(b'PKdata', out.getvalue())
+
+        payload = json.dumps({'download_file_name': 'root', 'items': [{'type': 'folder', 'id': '1'}]})
+        self.oauth2_client.post.assert_called_with(ZIP_DOWNLOADS_URL, data=payload)
+        self.oauth2_client.get.assert_called_with('https://dl.example.com/1', stream=True)
+
+    def test_export_folder_zip(self):
+        """
+        Ensures the archive is assembled locally when the zip download endpoint is not available
+        """
+        folder = self._mock_tree()
+        self.oauth2_client.post.side_effect = HTTPError(response=mock.Mock(status_code=403))
+
+        out = io.BytesIO()
+        self.client.export_folder(folder, out, max_in_flight_bytes=4)
+
+        archive = zipfile.ZipFile(io.BytesIO(out.getvalue()))
+
+        self.assertEqual(['root/', 'root/a.txt', 'root/sub/', u'root/sub/caf\xe9.txt'], archive.namelist())
+        self.assertEqual(b'foo', archive.read('root/a.txt'))
+        self.assertEqual(b'barbaz', archive.read(u'root/sub/caf\xe9.txt'))
+        self.assertEqual((2015, 1, 2, 3, 4, 4), archive.getinfo('root/a.txt').date_time)
+
+    def test_export_folder_tar(self):
+        folder = self._mock_tree()
+
+        out = io.BytesIO()
+        self.client.export_folder(folder, out, archive_format='tar')
+
+        archive = tarfile.open(fileobj=io.BytesIO(out.getvalue()))
+
+        name = u'root/sub/caf\xe9.txt'.encode('utf8')
+        self.assertEqual(['root', 'root/a.txt', 'root/sub', name], archive.getnames())
+        self.assertEqual(b'barbaz', archive.extractfile(name).read())
+        # 2015-01-02T03:04:05-08:00
+        self.assertEqual(1420196645, archive.getmember('root/a.txt').mtime)
+        self.assertEqual(False, self.oauth2_client.post.called)
+
     def test_file_info(self):
         item = {'id': 1234}
         url = FILE_URL.format(item['id'])
@@ -107,6 +331,47 @@ class ClientTestCase(unittest.TestCase):
 
         self.assertEqual(expected, info)
 
+    def test_file_info_many(self):
+        """
+        Ensures ids are requested once each and missing files are reported separately
+        """
+        def get(url, params):
+            response = mock.Mock()
+            if url == FILE_URL.format(3):
+                response.raise_for_status.side_effect = HTTPError(response=mock.Mock(status_code=404))
+            else:
+                response.json.return_value = {'url': url, 'params': params}
+            return response
+
+        self.oauth2_client.get.side_effect = get
+
+        items = [{'id': 1}, {'id': 2}, {'id': 1}, {'id': 3}]
+        missing = []
+
+        info = dict(self.client.file_info_many(items, fields='etag,sha1', missing=missing))
+
+        expected = {
+            1: {'url': FILE_URL.format(1), 'params': {'fields': 'etag,sha1'}},
+            2: {'url': FILE_URL.format(2), 'params': {'fields': 'etag,sha1'}},
+        }
+        self.assertEqual(expected, info)
+        self.assertEqual([3], missing)
+        self.assertEqual(3, self.oauth2_client.get.call_count)
+
+    def test_file_info_many_error(self):
+        self.oauth2_client.get.return_value.raise_for_status.side_effect = HTTPError(
+            response=mock.Mock(status_code=500))
+
+        self.assertRaises(HTTPError, list, self.client.file_info_many([{'id': 1}]))
+
+    def test_folder_info_many(self):
+        self.oauth2_client.get.return_value.json.return_value = {'size': 1}
+
+        info = dict(self.client.folder_info_many([{'id': 1}]))
+
+        self.assertEqual({1: {'size': 1}}, info)
+        self.oauth2_client.get.assert_called_with(FOLDER_URL.format(1), params={})
+
     def test_folders(self):
         """
         Ensures only one item is returned even though the limit is 100 by default
@@ -158,6 +423,108 @@ class ClientTestCase(unittest.TestCase):
 
         self.assertEqual(expected, tags)
 
+    def test_metadata_query(self):
+        """
+        Ensures pages are requested with the marker until there is no next marker
+        """
+        first = mock.Mock()
+        first.json.return_value = {'entries': ['a', 'b'], 'next_marker': 'm'}
+        second = mock.Mock()
+        second.json.return_value = {'entries': ['c'], 'next_marker': None}
+
+        bodies = []
+
+        def post(url, data):
+            bodies.append(json.loads(data))
+            return [first, second][len(bodies) - 1]
+
+        self.oauth2_client.post.side_effect = post
+
+        results = list(self.client.metadata_query(
+            'enterprise_1.classification', {'id': 0},
+            query='status = :status', query_params={'status': 'pending'}, fields=['name'],
+        ))
+
+        self.assertEqual(['a', 'b', 'c'], results)
+
+        expected = {
+            'from': 'enterprise_1.classification',
+            'ancestor_folder_id': '0',
+            'query': 'status = :status',
+            'query_params': {'status': 'pending'},
+            'fields': ['name'],
+            'limit': 100,
+        }
+        self.assertEqual(expected, bodies[0])
+
+        expected['marker'] = 'm'
+        self.assertEqual(expected, bodies[1])
+
+        self.oauth2_client.post.assert_called_with(METADATA_QUERY_URL, data=mock.ANY)
+
+    def test_metadata_query_limit(self):
+        self.oauth2_client.post.return_value.json.return_value = {'entries': ['a'] * 5, 'next_marker': 'm'}
+
+        results = list(self.client.metadata_query('enterprise_1.classification', {'id': 0}, limit=5))
+
+        self.assertEqual(['a'] * 5, results)
+        self.assertEqual(1, self.oauth2_client.post.call_count)
+
+        _args, _kwargs = self.oauth2_client.post.call_args
+        self.assertEqual(5, json.loads(_kwargs['data'])['limit'])
+
+    def test_metadata_templates(self):
+        self.oauth2_client.get.return_value.json.return_value = {'entries': ['template'], 'next_marker': None}
+
+        templates = list(self.client.metadata_templates())
+
+        self.assertEqual(['template'], templates)
+
+        self.oauth2_client.get.assert_called_with(METADATA_SCOPE_URL.format('enterprise'), params={'limit': 100})
+
+    def test_move(self):
+        item = {'id': 1234, 'type': 'folder'}
+        parent = {'id': 1}
+
+        self.client.move(item, parent, name='bar', etag='etag')
+
+        self.oauth2_client.put.assert_called_with(
+            FOLDER_URL.format(item['id']),
+            data=json.dumps({'parent': {'id': parent['id']}, 'name': 'bar'}),
+            headers={'If-Match': 'etag'},
+        )
+
+    def test_move_conflict_overwrite(self):
+        """
+        Ensures the conflicting item is deleted and the move retried
+        """
+        item = {'id': 1234}
+        parent = {'id': 1}
+
+        self.oauth2_client.put.side_effect = [
+            conflict_error({'id': 99, 'type': 'file', 'etag': '3', 'name': 'foo.txt'}),
+            mock.Mock(),
+        ]
+
+        self.client.move(item, parent, conflict=CONFLICT_OVERWRITE)
+
+        self.oauth2_client.delete.assert_called_with(FILE_URL.format(99), headers={'If-Match': '3'})
+        self.assertEqual(2, self.oauth2_client.put.call_count)
+
+    def test_move_many(self):
+        items = [{'id': 1, 'etag': '1'}, {'id': 2, 'type': 'folder'}]
+
+        # create the child mock up front; the workers would race to create it
+        self.oauth2_client.put.return_value.json.return_value = {}
+
+        moved = list(self.client.move_many(items, {'id': 3}))
+
+        self.assertEqual(2, len(moved))
+
+        payload = json.dumps({'parent': {'id': 3}})
+        self.oauth2_client.put.assert_any_call(FILE_URL.format(1), data=payload, headers={'If-Match': '1'})
+        self.oauth2_client.put.assert_any_call(FOLDER_URL.format(2), data=payload, headers={})
+
     def test_remove_tags(self):
         item = {'id': 1234}
         tags = ['foo']
@@ -239,6 +606,163 @@ class ClientTestCase(unittest.TestCase):
             params={'limit': 100, 'offset': 0}
         )
 
+    def test_search(self):
+        self.oauth2_client.get.return_value.json.return_value = {'total_count': 1, 'entries': ['file']}
+
+        results = list(self.client.search(
+            'foo',
+            item_type='file',
+            file_extensions=['pdf', 'txt'],
+            ancestor_folders=[{'id': 1}, {'id': 2}],
+            created_at_range=(datetime.datetime(2015, 1, 2, 3, 4, 5), None),
+            fields='name,size',
+        ))
+
+        self.assertEqual(['file'], results)
+
+        self.oauth2_client.get.assert_called_once_with(SEARCH_URL, params={
+            'query': 'foo',
+            'type': 'file',
+            'file_extensions': 'pdf,txt',
+            'ancestor_folder_ids': '1,2',
+            'created_at_range': '2015-01-02T03:04:05Z,',
+            'fields': 'name,size',
+            'limit': 100,
+            'offset': 0,
+        })
+
+    def test_search_pages(self):
+        """
+        Ensures following pages are requested up to the limit and yielded in order
+        """
+        def get(url, params):
+            response = mock.Mock()
+            response.json.return_value = {
+                'total_count': 1000,
+                'entries': range(params['offset'], params['offset'] + params['limit']),
+            }
+            return response
+
+        self.oauth2_client.get.side_effect = get
+
+        results = list(self.client.search('foo', limit=450))
+
+        self.assertEqual(range(450), results)
+
+        offsets = sorted(_kwargs['params']['offset'] for _args, _kwargs in self.oauth2_client.get.call_args_list)
+        self.assertEqual([0, 200, 400], offsets)
+
+    def test_search_prefetch(self):
+        """
+        Ensures the following page is requested while the first page is consumed
+        """
+        requested = threading.Event()
+
+        def get(url, params):
+            if params['offset'] == 200:
+                requested.set()
+
+            response = mock.Mock()
+            response.json.return_value = {
+                'total_count': 1000,
+                'entries': range(params['offset'], params['offset'] + params['limit']),
+            }
+            return response
+
+        self.oauth2_client.get.side_effect = get
+
+        results = self.client.search('foo', limit=400)
+
+        self.assertEqual(0, next(results))
+        self.assertTrue(requested.wait(5))
+
+        results.close()
+
+    def test_search_total_count(self):
+        """
+        Ensures no additional pages are requested when total_count is hit
+        """
+        self.oauth2_client.get.return_value.json.return_value = {'total_count': 2, 'entries': ['a', 'b']}
+
+        results = list(self.client.search('foo', limit=1000))
+
+        self.assertEqual(['a', 'b'], results)
+        self.assertEqual(1, self.oauth2_client.get.call_count)
+
+    def test_set_metadata(self):
+        item = {'id': 123}
+        data = {'status': 'pending'}
+
+        expected = {'status': 'pending', '$parent': 'file_123'}
+        self.oauth2_client.post.return_value.json.return_value = expected
+
+        instance = self.client.set_metadata(item, 'enterprise', 'classification', data)
+
+        self.assertEqual(expected, instance)
+
+        url = FILE_METADATA_URL.format(item['id'], 'enterprise', 'classification')
+        self.oauth2_client.post.assert_called_with(url, data=json.dumps(data))
+
+    def test_set_metadata_existing_instance(self):
+        """
+        Ensures an existing instance is updated with a JSON patch
+        """
+        item = {'id': 123}
+        data = {'status': 'done', 'reviewer': 'foo'}
+
+        error = HTTPError(response=mock.Mock(status_code=409))
+        self.oauth2_client.post.side_effect = error
+
+        expected = {'status': 'done', 'reviewer': 'foo'}
+        self.oauth2_client.put.return_value.json.return_value = expected
+
+        instance = self.client.set_metadata(item, 'enterprise', 'classification', data)
+
+        self.assertEqual(expected, instance)
+
+        url = FILE_METADATA_URL.format(item['id'], 'enterprise', 'classification')
+        operations = [
+            {'op': 'add', 'path': '/reviewer', 'value': 'foo'},
+            {'op': 'add', 'path': '/status', 'value': 'done'},
+        ]
+        self.oauth2_client.put.assert_called_with(
+            url, data=json.dumps(operations), headers={'Content-Type': 'application/json-patch+json'})
+
+    def test_set_metadata_many(self):
+        self.oauth2_client.post.return_value.json.return_value = {'status': 'pending'}
+
+        operations = [({'id': i}, 'enterprise', 'classification', {'status': 'pending'}) for i in range(10)]
+
+        instances = dict((item['id'], instance) for item, instance in self.client.set_metadata_many(operations))
+
+        self.assertEqual(dict((i, {'status': 'pending'}) for i in range(10)), instances)
+        self.assertEqual(10, self.oauth2_client.post.call_count)
+
+    def test_set_metadata_many_failed(self):
+        """
+        Ensures an operation that fails does not stop the others
+        """
+        error = HTTPError(response=mock.Mock(status_code=404))
+
+        def post(url, data):
+            if url == FILE_METADATA_URL.format(2, 'enterprise', 'classification'):
+                raise error
+
+            response = mock.Mock()
+            response.json.return_value = {'$parent': url}
+            return response
+
+        self.oauth2_client.post.side_effect = post
+
+        operations = [({'id': i}, 'enterprise', 'classification', {'status': 'pending'}) for i in range(1, 4)]
+
+        failed = []
+        instances = dict((item['id'], instance) for item, instance in self.client.set_metadata_many(
+            operations, failed=failed))
+
+        self.assertEqual([1, 3], sorted(instances))
+        self.assertEqual([(operations[1], error)], failed)
+
     def test_set_tags(self):
         item = {'id': 123}
         tags = ['foo']
@@ -251,6 +775,108 @@ class ClientTestCase(unittest.TestCase):
 
         self.oauth2_client.put.assert_called_with(url, data=data)
 
+    def test_set_tags_with_etag(self):
+        item = {'id': 123}
+        tags = ['foo']
+
+        url = FILE_URL.format(item['id'])
+        data = json.dumps({'tags': tags})
+
+        self.client.set_tags(item, tags, etag='etag')
+
+        self.oauth2_client.put.assert_called_with(url, data=data, headers={'If-Match': 'etag'})
+
+    def test_update_tags(self):
+        """
+        Ensures operations on the same item are merged into one read and one write
+        """
+        item = {'id': 123}
+
+        self.oauth2_client.get.return_value.json.return_value = {'tags': ['foo', 'bar'], 'etag': 'etag'}
+
+        operations = [
+            (item, ['baz'], []),
+            (item, ['qux'], ['foo']),
+            (item, [], ['baz']),
+        ]
+
+        result = self.client.update_tags(operations)
+
+        self.assertEqual({123: ['bar', 'qux']}, result)
+
+        self.assertEqual(1, self.oauth2_client.get.call_count)
+        self.oauth2_client.put.assert_called_once_with(
+            FILE_URL.format(item['id']),
+            data=json.dumps({'tags': ['bar', 'qux']}),
+            headers={'If-Match': 'etag'},
+        )
+
+    def test_update_tags_cached(self):
+        """
+        Ensures tags carried in the item dictionary are not fetched again
+        """
+        items = [
+            {'id': 1, 'tags': ['foo'], 'etag': 'a'},
+            {'id': 2, 'tags': ['bar'], 'etag': 'b'},
+        ]
+
+        result = self.client.update_tags((item, ['foo'], []) for item in items)
+
+        self.assertEqual({1: ['foo'], 2: ['bar', 'foo']}, result)
+
+        self.assertEqual(False, self.oauth2_client.get.called)
+        self.oauth2_client.put.assert_called_once_with(
+            FILE_URL.format(2),
+            data=json.dumps({'tags': ['bar', 'foo']}),
+            headers={'If-Match': 'b'},
+        )
+
+    def test_update_tags_precondition_failed(self):
+        """
+        Ensures the tags are fetched again and the write retried on 412
+        """
+        item = {'id': 123, 'tags': ['foo'], 'etag': 'old'}
+
+        error = HTTPError(response=mock.Mock(status_code=412))
+        self.oauth2_client.put.side_effect = [error, mock.Mock()]
+        self.oauth2_client.get.return_value.json.return_value = {'tags': ['foo', 'bar'], 'etag': 'new'}
+
+        result = self.client.update_tags([(item, ['baz'], [])])
+
+        self.assertEqual({123: ['foo', 'bar', 'baz']}, result)
+
+        self.oauth2_client.put.assert_called_with(
+            FILE_URL.format(item['id']),
+            data=json.dumps({'tags': ['foo', 'bar', 'baz']}),
+            headers={'If-Match': 'new'},
+        )
+
+    def test_update_tags_failed(self):
+        """
+        Ensures an item that cannot be updated does not stop the others
+        """
+        items = [
+            {'id': 1, 'tags': [], 'etag': 'a'},
+            {'id': 2, 'tags': [], 'etag': 'b'},
+            {'id': 3, 'tags': [], 'etag': 'c'},
+        ]
+
+        error = HTTPError(response=mock.Mock(status_code=404))
+
+        def put(url, data, headers):
+            if url == FILE_URL.format(2):
+                raise error
+
+            return mock.Mock()
+
+        self.oauth2_client.put.side_effect = put
+
+        failed = {}
+        result = self.client.update_tags([(item, ['foo'], []) for item in items], failed=failed)
+
+        self.assertEqual({1: ['foo'], 3: ['foo']}, result)
+        self.assertEqual({2: error}, failed)
+
     def test_update(self):
         item = {'id': 1234}
 
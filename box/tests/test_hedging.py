@@ -0,0 +1,168 @@
+import mock
+import threading
+import unittest
+
+from box import Client, HedgingPolicy
+from box.models import FILE_URL
+
+
+class HedgingPolicyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.policy = HedgingPolicy(initial_delay=0.01, budget=1.0)
+
+    def slow_then_fast(self):
+        """
+        Returns a function whose first call blocks until released and whose second call returns at once
+        """
+        release = threading.Event()
+        slow = mock.Mock(name='slow')
+        fast = mock.Mock(name='fast')
+        calls = []
+
+        def func():
+            calls.append(1)
+            if len(calls) == 1:
+                release.wait(5)
+                return slow
+
+            return fast
+
+        return func, release, slow, fast
+
+    def test_fast(self):
+        response = mock.Mock()
+
+        self.assertEqual(response, self.policy.call(lambda: response))
+        self.assertEqual({'requests': 1, 'hedges': 0, 'hedge_wins': 0}, self.policy.stats())
+
+    def test_hedged(self):
+        """
+        Ensures a slow request is hedged and the losing response closed
+        """
+        func, release, slow, fast = self.slow_then_fast()
+
+        self.assertEqual(fast, self.policy.call(func))
+        self.assertEqual({'requests': 1, 'hedges': 1, 'hedge_wins': 1}, self.policy.stats())
+
+        release.set()
+        for _ in range(100):
+            if slow.close.called:
+                break
+            threading.Event().wait(0.01)
+
+        self.assertEqual(True, slow.close.called)
+
+    def test_budget(self):
+        """
+        Ensures requests are not hedged beyond the budget
+        """
+        self.policy.budget = 0.5
+
+        func, release, slow, fast = self.slow_then_fast()
+        threading.Timer(0.05, release.set).start()
+
+        self.assertEqual(slow, self.policy.call(func))
+        self.assertEqual({'requests': 1, 'hedges': 0, 'hedge_wins': 0}, self.policy.stats())
+
+    def test_budget_used_up(self):
+        """
+        Ensures requests that cannot be hedged are made on the calling thread
+        """
+        self.policy.budget = 0.0
+
+        threads = []
+        self.policy.call(lambda: threads.append(threading.current_thread()))
+
+        self.assertEqual([threading.current_thread()], threads)
+        self.assertEqual(1, len(self.policy.latencies))
+
+    def test_latency_of_original(self):
+        """
+        Ensures the latency recorded is the original request's, even when the hedge wins
+        """
+        func, release, slow, fast = self.slow_then_fast()
+
+        self.assertEqual(fast, self.policy.call(func))
+        self.assertEqual(0, len(self.policy.latencies))
+
+        threading.Timer(0.05, release.set).start()
+        for _ in range(100):
+            if self.policy.latencies:
+                break
+            threading.Event().wait(0.01)
+
+        self.assertEqual(1, len(self.policy.latencies))
+        self.assertTrue(self.policy.latencies[0] >= 0.05)
+
+    def test_latency_of_error(self):
+        def func():
+            raise ValueError()
+
+        self.assertRaises(ValueError, self.policy.call, func)
+        self.assertEqual(1, len(self.policy.latencies))
+
+    def test_error(self):
+        """
+        Ensures the hedge's response is used when the original request fails
+        """
+        release = threading.Event()
+        calls = []
+        response = mock.Mock()
+
+        def func():
+            calls.append(1)
+            if len(calls) == 1:
+                release.wait(5)
+                raise ValueError()
+
+            release.set()
+            return response
+
+        self.assertEqual(response, self.policy.call(func))
+
+    def test_error_not_hedged(self):
+        def func():
+            raise ValueError()
+
+        self.assertRaises(ValueError, self.policy.call, func)
+
+    def test_delay(self):
+        """
+        Ensures the delay adapts to the given percentile of observed latencies
+        """
+        policy = HedgingPolicy(percentile=90, min_samples=10, min_delay=0.0)
+        self.assertEqual(policy.initial_delay, policy.delay())
+
+        policy.latencies.extend(range(1, 11))
+        self.assertEqual(9, policy.delay())
+
+        policy.min_delay = 20
+        self.assertEqual(20, policy.delay())
+
+
+class HedgedClientTestCase(unittest.TestCase):
+    def setUp(self):
+        self.oauth2_client = mock.Mock()
+        self.policy = HedgingPolicy()
+        self.client = Client(self.oauth2_client, hedging=self.policy)
+
+    def test_get(self):
+        expected = {'etag': '1'}
+        self.oauth2_client.get.return_value.json.return_value = expected
+
+        self.assertEqual(expected, self.client.file_info({'id': 1234}, fields='etag'))
+
+        self.oauth2_client.get.assert_called_with(FILE_URL.format(1234), params={'fields': 'etag'})
+        self.assertEqual(1, self.policy.stats()['requests'])
+
+    def test_not_hedged(self):
+        """
+        Ensures writes and downloads are not hedged
+        """
+        self.oauth2_client.get.return_value.iter_content.return_value = []
+
+        self.client.delete({'id': 1234, 'etag': '1'})
+        self.client.download({'id': 1234}, mock.Mock())
+
+        self.assertEqual(True, self.oauth2_client.delete.called)
+        self.assertEqual(0, self.policy.stats()['requests'])
@@ -0,0 +1,134 @@
+import mock
+import unittest
+
+from requests.exceptions import HTTPError
+
+from box import ClientPool
+from box.models import FILE_URL, UPLOAD_FILE_URL
+from box.pool import FAILURE_BACKOFF, MAX_FAILURES, ROUTE_LEAST_LOADED
+
+
+def response(status_code=200, headers=None):
+    _response = mock.Mock(status_code=status_code, headers=headers or {})
+    _response.json.return_value = {'total_count': 0, 'entries': []}
+
+    return _response
+
+
+class ClientPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.oauth2_clients = [mock.Mock() for _ in range(4)]
+        for oauth2_client in self.oauth2_clients:
+            for method in ('get', 'post', 'put', 'delete'):
+                getattr(oauth2_client, method).return_value = response()
+
+        self.now = 1000.0
+        self.pool = ClientPool(self.oauth2_clients)
+        self.pool.oauth2_client.clock = lambda: self.now
+        self.pool.oauth2_client.sleep = mock.Mock()
+
+    def used(self, method='get'):
+        return [i for i, c in enumerate(self.oauth2_clients) if getattr(c, method).called]
+
+    def test_hash_routing(self):
+        """
+        Ensures requests for the same item are sent with the same credential
+        """
+        for _ in range(5):
+            self.pool.file_info({'id': 1234})
+            list(self.pool.folder_items({'id': 1234}))
+
+        self.assertEqual(1, len(self.used()))
+
+    def test_hash_routing_spreads_items(self):
+        for item_id in range(100):
+            self.pool.file_info({'id': item_id})
+
+        self.assertEqual([0, 1, 2, 3], self.used())
+
+    def test_least_loaded_routing(self):
+        pool = ClientPool(self.oauth2_clients, routing=ROUTE_LEAST_LOADED)
+        session = pool.oauth2_client
+
+        for index in (0, 1, 3):
+            session.credentials[index].in_flight = 1
+
+        pool.upload({'id': 0}, mock.Mock(name='foo.txt'))
+
+        self.assertEqual([2], self.used('post'))
+        self.oauth2_clients[2].post.assert_called_with(
+            UPLOAD_FILE_URL, data={'parent_id': 0}, files=mock.ANY, headers={})
+
+    def test_throttled(self):
+        """
+        Ensures a throttled request is sent again with another credential, which is then preferred
+        """
+        url = FILE_URL.format(1234)
+
+        self.pool.file_info({'id': 1234})
+        first = self.used()[0]
+
+        getattr(self.oauth2_clients[first], 'get').return_value = response(429, {'Retry-After': '10'})
+
+        info = self.pool.file_info({'id': 1234})
+
+        retried = [i for i in self.used() if i != first]
+        self.assertEqual(1, len(retried))
+        self.assertEqual(self.oauth2_clients[retried[0]].get.return_value.json.return_value, info)
+
+        stats = self.pool.stats()
+        self.assertEqual(1, stats[first]['throttled'])
+        self.assertEqual(False, stats[first]['available'])
+
+        # the credential is used again once it has rested
+        self.now += 10
+        self.oauth2_clients[first].get.reset_mock()
+        self.oauth2_clients[first].get.return_value = response()
+
+        self.pool.oauth2_client.get(url)
+
+        self.assertEqual(True, self.oauth2_clients[first].get.called)
+
+    def test_throttled_http_error(self):
+        """
+        Ensures oauth2 clients raising HTTPError for 429 are handled the same way
+        """
+        self.pool.file_info({'id': 1234})
+        first = self.used()[0]
+
+        self.oauth2_clients[first].get.side_effect = HTTPError(response=response(429))
+
+        self.pool.file_info({'id': 1234})
+
+        self.assertEqual(2, len(self.used()))
+
+    def test_all_throttled(self):
+        """
+        Ensures the last response is returned when every credential is throttled
+        """
+        for oauth2_client in self.oauth2_clients:
+            oauth2_client.get.return_value = response(429)
+
+        result = self.pool.oauth2_client.get(FILE_URL.format(1234))
+
+        self.assertEqual(429, result.status_code)
+        self.assertEqual(True, self.pool.oauth2_client.sleep.called)
+
+    def test_failing(self):
+        """
+        Ensures a repeatedly failing credential is rested
+        """
+        self.pool.file_info({'id': 1234})
+        first = self.used()[0]
+
+        self.oauth2_clients[first].get.return_value = response(500)
+        for _ in range(MAX_FAILURES):
+            self.pool.file_info({'id': 1234})
+
+        self.assertEqual(False, self.pool.stats()[first]['available'])
+
+        self.pool.file_info({'id': 1234})
+        self.assertEqual(2, len(self.used()))
+
+        self.now += FAILURE_BACKOFF
+        self.assertEqual(True, self.pool.stats()[first]['available'])
@@ -0,0 +1,159 @@
+import io
+import json
+import mock
+import time
+import unittest
+
+from requests.exceptions import HTTPError
+
+from box import Client, InMemoryCollector, JsonLinesExporter, Tracer
+from box.models import FILE_URL, UPDATE_FILE_URL
+
+
+class TracingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.oauth2_client = mock.Mock()
+        self.oauth2_client.get.return_value.status_code = 200
+        self.oauth2_client.get.return_value.headers = {'Content-Length': '42'}
+
+        self.collector = InMemoryCollector()
+        self.client = Client(self.oauth2_client, tracer=Tracer(self.collector))
+
+    def spans(self):
+        return dict((span.name, span) for span in self.collector.spans)
+
+    def test_method_spans(self):
+        """
+        Ensures nested method calls and requests are recorded as child spans
+        """
+        self.oauth2_client.get.return_value.json.return_value = {'etag': '1'}
+
+        self.client.get_etag({'id': 1234})
+
+        spans = self.spans()
+        self.assertEqual(['http.get', 'item_info', 'file_info', 'get_etag'], [s.name for s in self.collector.spans])
+
+        self.assertEqual(None, spans['get_etag'].parent_id)
+        self.assertEqual(spans['get_etag'].span_id, spans['file_info'].parent_id)
+        self.assertEqual(spans['item_info'].span_id, spans['http.get'].parent_id)
+        self.assertEqual(1, len(set(s.trace_id for s in self.collector.spans)))
+
+        self.assertEqual(1234, spans['get_etag'].attributes['item_id'])
+        self.assertEqual({
+            'http.method': 'GET',
+            'http.url': FILE_URL.format(1234),
+            'http.status_code': 200,
+            'bytes_received': 42,
+        }, spans['http.get'].attributes)
+
+    def test_extra_lookup(self):
+        fileobj = mock.Mock()
+        fileobj.name = 'foo.txt'
+
+        self.oauth2_client.get.return_value.json.return_value = {'etag': '1'}
+
+        self.client.update({'id': 1234}, fileobj)
+
+        spans = self.spans()
+        self.assertEqual(True, spans['update'].attributes['extra_lookup'])
+        self.assertEqual(spans['update'].span_id, spans['get_etag'].parent_id)
+
+        self.oauth2_client.post.assert_called_with(
+            UPDATE_FILE_URL.format(1234), files=mock.ANY, headers={'If-Match': '1'})
+
+    def test_bytes_sent(self):
+        """
+        Ensures the size of an uploaded file is recorded on the method and request spans
+        """
+        self.client.upload_or_update({'id': 1}, io.BytesIO(b'foobar'), filename='foo.txt')
+
+        spans = self.spans()
+        self.assertEqual(6, spans['upload_or_update'].attributes['bytes_sent'])
+        self.assertEqual(6, spans['upload'].attributes['bytes_sent'])
+        self.assertEqual(6, spans['http.post'].attributes['bytes_sent'])
+
+    def test_error(self):
+        error = HTTPError(response=mock.Mock(status_code=404, headers={}))
+        self.oauth2_client.delete.side_effect = error
+
+        self.assertRaises(HTTPError, self.client.delete, {'id': 1234, 'etag': '1'})
+
+        spans = self.spans()
+        self.assertEqual(404, spans['http.delete'].attributes['http.status_code'])
+        self.assertIn('error', spans['delete'].attributes)
+
+    def test_generator(self):
+        """
+        Ensures a generator's span covers its iteration and its pages' requests
+        """
+        self.oauth2_client.get.return_value.json.return_value = {'total_count': 1, 'entries': ['folder']}
+
+        items = self.client.folder_items()
+        self.assertEqual([], self.collector.spans)
+
+        self.assertEqual(['folder'], list(items))
+
+        spans = self.spans()
+        self.assertEqual(spans['folder_items'].span_id, spans['http.get'].parent_id)
+
+    def test_worker_threads(self):
+        """
+        Ensures requests made on worker threads are children of the calling method's span
+        """
+        self.oauth2_client.get.return_value.json.return_value = {'size': 1}
+
+        dict(self.client.file_info_many([{'id': 1}, {'id': 2}]))
+
+        root = self.spans()['file_info_many']
+        requests = [span for span in self.collector.spans if span.name == 'http.get']
+
+        self.assertEqual(2, len(requests))
+        self.assertEqual(set([root.span_id]), set(span.parent_id for span in requests))
+
+    def test_sample_rate(self):
+        self.client.tracer.sample_rate = 0.0
+
+        self.client.delete({'id': 1234, 'etag': '1'})
+
+        self.assertEqual([], self.collector.spans)
+
+    def test_json_lines(self):
+        out = mock.Mock()
+        client = Client(self.oauth2_client, tracer=Tracer(JsonLinesExporter(out)))
+
+        client.delete_folder({'id': 1})
+
+        lines = [json.loads(_args[0]) for _args, _kwargs in out.write.call_args_list]
+        self.assertEqual(['http.delete', 'delete_folder'], [line['name'] for line in lines])
+        self.assertEqual(lines[1]['span_id'], lines[0]['parent_id'])
+
+    def test_profile(self):
+        self.client.tracer = Tracer(self.collector, profile=True, profile_interval=0.001)
+        self.oauth2_client.delete.side_effect = lambda *args, **kwargs: time.sleep(0.05)
+
+        self.client.delete({'id': 1234, 'etag': '1'})
+
+        profile = self.spans()['delete'].attributes['profile']
+        self.assertTrue(profile)
+        self.assertTrue(any('delete (models.py)' in stack for stack in profile))
+
+    def test_profile_interleaved(self):
+        """
+        Ensures overlapping top-level spans on one thread are each profiled
+        """
+        client = Client(self.oauth2_client, tracer=Tracer(self.collector, profile=True, profile_interval=0.001))
+
+        self.oauth2_client.get.return_value.json.return_value = {'total_count': 2, 'entries': [{'id': 1}, {'id': 2}]}
+        self.oauth2_client.delete.side_effect = lambda *args, **kwargs: time.sleep(0.05)
+
+        for item in client.folder_items():
+            client.delete_folder(item)
+
+        spans = [span for span in self.collector.spans if span.parent_id is None]
+        self.assertEqual(['delete_folder', 'delete_folder', 'folder_items'], sorted(span.name for span in spans))
+
+        for span in spans:
+            self.assertTrue(span.attributes['profile'], span.name)
+
+        folder_items = [span for span in spans if span.name == 'folder_items'][0]
+        self.assertTrue(any('delete_folder (models.py)' in stack for stack in folder_items.attributes['profile']))
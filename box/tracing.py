@@ -0,0 +1,408 @@
+from __future__ import absolute_import
+
+import functools
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from collections import Counter
+
+from requests.exceptions import HTTPError
+
+# how many of the most sampled stacks to keep on a span
+PROFILE_STACKS = 20
+
+# how many frames of a stack to keep
+PROFILE_DEPTH = 30
+
+
+def _new_id():
+    return '{:016x}'.format(random.getrandbits(64))
+
+
+def _remaining_bytes(fileobj):
+    """
+    Returns how many bytes are left to read from the given file-like object, or None when it is not seekable
+    """
+    try:
+        position = fileobj.tell()
+        fileobj.seek(0, 2)
+        size = fileobj.tell() - position
+        fileobj.seek(position)
+    except (AttributeError, IOError, OSError, TypeError, ValueError):
+        return None
+
+    return size
+
+
+class Span(object):
+    """
+    A timed operation, e.g. a Client method call or one of its HTTP requests
+    """
+    def __init__(self, name, trace_id, parent_id=None, sampled=True, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = attributes or {}
+
+        self.start = time.time()
+        self.end = None
+
+        # the thread being profiled for this span, if any
+        self.thread = None
+
+    @property
+    def duration(self):
+        return None if self.end is None else self.end - self.start
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'duration': self.duration,
+            'attributes': self.attributes,
+        }
+
+
+class InMemoryCollector(object):
+    """
+    Span exporter that keeps the spans in a list
+    """
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+class JsonLinesExporter(object):
+    """
+    Span exporter that writes each span as a line of JSON to the given file-like object
+    """
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str, sort_keys=True)
+
+        with self.lock:
+            self.fileobj.write(line + '\n')
+            self.fileobj.flush()
+
+
+class SamplingProfiler(object):
+    """
+    Periodically samples the stacks of registered threads
+
+    Each thread may be registered under several keys at once, e.g. for a
+    traced generator and a call made while iterating it; every sample of the
+    thread is credited to each of its keys.  A single background thread runs
+    while any thread is registered.
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+
+        # thread ident -> key -> Counter
+        self.threads = {}
+        self.lock = threading.Lock()
+        self.sampler = None
+
+    def start(self, ident, key):
+        """
+        Starts sampling the given thread for the given key
+        """
+        with self.lock:
+            self.threads.setdefault(ident, {})[key] = Counter()
+
+            if self.sampler is None:
+                self.sampler = threading.Thread(target=self._run)
+                self.sampler.daemon = True
+                self.sampler.start()
+
+    def stop(self, ident, key):
+        """
+        Stops sampling the given thread for the given key
+
+        :return: Counter of collapsed stacks, root first, e.g. `run (cli.py);upload (models.py)`
+        """
+        with self.lock:
+            counters = self.threads.get(ident, {})
+            counter = counters.pop(key, Counter())
+
+            if not counters:
+                self.threads.pop(ident, None)
+
+        return counter
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+
+            with self.lock:
+                if not self.threads:
+                    self.sampler = None
+                    return
+
+                frames = sys._current_frames()
+                for ident, counters in self.threads.items():
+                    frame = frames.get(ident)
+                    if frame is None:
+                        continue
+
+                    stack = self._collapse(frame)
+                    for counter in counters.values():
+                        counter[stack] += 1
+
+    def _collapse(self, frame):
+        stack = []
+        while frame is not None and len(stack) < PROFILE_DEPTH:
+            code = frame.f_code
+            stack.append('{} ({})'.format(code.co_name, os.path.basename(code.co_filename)))
+            frame = frame.f_back
+
+        return ';'.join(reversed(stack))
+
+
+class Tracer(object):
+    """
+    Records spans for Client method calls and their HTTP requests
+
+        collector = InMemoryCollector()
+        client = Client(oauth2_client, tracer=Tracer(collector))
+
+    Each public Client method call is a span, with a child span for each
+    method it calls and each HTTP request it makes.  Spans are exported when
+    they end.  Only the given fraction of top-level calls are traced; when
+    profile is set, the stacks of the calling thread are sampled while a
+    top-level call runs and attached to its span as the `profile` attribute.
+    """
+    def __init__(self, exporter, sample_rate=1.0, profile=False, profile_interval=0.005):
+        """
+        Tracer constructor
+        :param exporter: object with an export(span) method, e.g. InMemoryCollector or JsonLinesExporter
+        :param sample_rate: Fraction of top-level calls to trace
+        :param profile: Whether to sample the stacks of traced calls
+        :param profile_interval: Seconds between stack samples
+        :return:
+        """
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.profiler = SamplingProfiler(profile_interval) if profile else None
+
+        self.local = threading.local()
+
+    def annotate(self, **attributes):
+        """
+        Sets attributes on the current span, if any
+        """
+        span = self.current_span()
+        if span is not None:
+            span.attributes.update(attributes)
+
+    def bind(self, func):
+        """
+        Returns func wrapped to run within the current span, e.g. on a worker thread
+        """
+        span = self.current_span()
+        if span is None:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self._push(span)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._pop()
+
+        return wrapper
+
+    def current_span(self):
+        stack = getattr(self.local, 'stack', None)
+        return stack[-1] if stack else None
+
+    def finish(self, span):
+        span.end = time.time()
+
+        if span.thread is not None:
+            stacks = self.profiler.stop(span.thread, span.span_id)
+            span.attributes['profile'] = dict(stacks.most_common(PROFILE_STACKS))
+
+        if span.sampled:
+            self.exporter.export(span)
+
+    def start(self, name, **attributes):
+        """
+        Starts a span as a child of the current span and makes it the current span
+
+        :return: Span; call deactivate() and then finish() when the operation is done
+        """
+        parent = self.current_span()
+
+        if parent is None:
+            span = Span(name, _new_id(), sampled=random.random() < self.sample_rate, attributes=attributes)
+
+            if self.profiler is not None and span.sampled:
+                span.thread = threading.current_thread().ident
+                self.profiler.start(span.thread, span.span_id)
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, sampled=parent.sampled, attributes=attributes)
+
+        self._push(span)
+
+        return span
+
+    def deactivate(self):
+        self._pop()
+
+    def _pop(self):
+        self.local.stack.pop()
+
+    def _push(self, span):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+
+        self.local.stack.append(span)
+
+
+def _traced_generator(tracer, span, generator):
+    """
+    Generator that runs each step of the given generator within span, finishing it at the end
+    """
+    try:
+        while True:
+            tracer._push(span)
+            try:
+                value = next(generator)
+            except StopIteration:
+                return
+            except Exception as exc:
+                span.attributes['error'] = repr(exc)
+                raise
+            finally:
+                tracer._pop()
+
+            yield value
+    finally:
+        generator.close()
+        tracer.finish(span)
+
+
+def traced(func):
+    """
+    Decorator for Client methods, recording a span for each call when the client has a tracer
+
+    Generators are traced until they are exhausted or closed.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        tracer = self.tracer
+        if tracer is None:
+            return func(self, *args, **kwargs)
+
+        attributes = {}
+        for arg in args:
+            if isinstance(arg, dict) and 'id' in arg:
+                attributes['item_id'] = arg['id']
+                break
+
+        span = tracer.start(func.__name__, **attributes)
+        try:
+            result = func(self, *args, **kwargs)
+        except Exception as exc:
+            span.attributes['error'] = repr(exc)
+            tracer.deactivate()
+            tracer.finish(span)
+            raise
+
+        tracer.deactivate()
+
+        if inspect.isgenerator(result):
+            return _traced_generator(tracer, span, result)
+
+        tracer.finish(span)
+
+        return result
+
+    return wrapper
+
+
+class _TracedSession(object):
+    """
+    Stands in for an oauth2_client, recording a span for each request
+    """
+    def __init__(self, oauth2_client, tracer):
+        self.oauth2_client = oauth2_client
+        self.tracer = tracer
+
+    def __getattr__(self, name):
+        return getattr(self.oauth2_client, name)
+
+    def delete(self, url, **kwargs):
+        return self.request('delete', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('get', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('post', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('put', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        attributes = {
+            'http.method': method.upper(),
+            'http.url': url,
+        }
+
+        data = kwargs.get('data')
+        if isinstance(data, (bytes, type(u''))):
+            attributes['bytes_sent'] = len(data)
+
+        for value in (kwargs.get('files') or {}).values():
+            fileobj = value[1] if isinstance(value, tuple) else value
+            size = _remaining_bytes(fileobj)
+            if size is not None:
+                attributes['bytes_sent'] = attributes.get('bytes_sent', 0) + size
+
+        span = self.tracer.start('http.{}'.format(method), **attributes)
+        try:
+            response = getattr(self.oauth2_client, method)(url, **kwargs)
+        except HTTPError as exc:
+            self._record_response(span, exc.response)
+            span.attributes['error'] = repr(exc)
+            raise
+        except Exception as exc:
+            span.attributes['error'] = repr(exc)
+            raise
+        else:
+            self._record_response(span, response)
+        finally:
+            self.tracer.deactivate()
+            self.tracer.finish(span)
+
+        return response
+
+    def _record_response(self, span, response):
+        if response is None:
+            return
+
+        status_code = getattr(response, 'status_code', None)
+        if isinstance(status_code, int):
+            span.attributes['http.status_code'] = status_code
+
+        try:
+            span.attributes['bytes_received'] = int(response.headers['Content-Length'])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            pass
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 import os
 
-from distutils.core import setup
+from setuptools import setup
 
 
 install_requires = [
@@ -18,4 +18,9 @@ setup(name='boxclient',
       url='http://github.com/rca/box',
       license='LICENSE',
       install_requires=install_requires,
+      entry_points={
+          'console_scripts': [
+              'box = box.cli:main',
+          ],
+      },
 )